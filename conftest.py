@@ -0,0 +1 @@
+# Its presence puts the project root on sys.path, so tests can import utils.*
@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from quiz_session import QuizSession
+from utils import db
+from utils.migrations import ensure_answer_partitions, migrate
+from utils.passwords import get_hasher
+from utils.question_bank import get_question_bank
+from utils.repository import (
+    save_user_pg, fetch_password_hash_pg, save_quiz_result_pg, save_answer_events_pg,
+    fetch_user_results_pg, has_given_feedback, save_feedback
+)
+from utils.write_behind import WriteBehindBuffer
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "data/loadtest")
+
+
+# ================== LOAD TEST ==================
+# Simulates N virtual quiz takers, each on its own thread, running the same
+# database paths main.py uses: register, login, then repeated quizzes (play a
+# headless QuizSession, save the result and its answers, fetch history) and one feedback
+# check/submit. Every operation is timed; the report gives throughput and
+# p50/p95/p99 latency per operation plus client pool and server connection
+# counts, and is written as JSON so runs can be compared over time.
+# Password hashing uses the PASSWORD_* settings from utils/passwords.py.
+#
+#   python loadtest.py --users 50 --duration 60
+#   python loadtest.py --users 200 --pool-max 20 --save-mode write-behind
+#   python loadtest.py --pgserver /tmp/quiz-pg      (embedded PostgreSQL, needs `pip install pgserver`)
+#
+# Without --pgserver it connects with the DB_HOST / DB_NAME / DB_USER /
+# DB_PASS / DB_PORT environment variables, e.g. a local Docker container.
+# Load-test users are named lt_<run id>_<n>; --cleanup deletes their rows.
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # operation -> [seconds]
+        self.errors = {}   # operation -> count
+
+    def timed(self, op, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.errors[op] = self.errors.get(op, 0) + 1
+            print(f"{op} failed:", e)
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples.setdefault(op, []).append(elapsed)
+        return result
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# ---------- Connection sampling ----------
+class ConnectionSampler(threading.Thread):
+    # Polls pg_stat_activity on a dedicated connection (outside the pool under test)
+    def __init__(self, conn_kwargs, interval=0.5):
+        super().__init__(name="loadtest-connections", daemon=True)
+        self.conn_kwargs = conn_kwargs
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        import psycopg2
+        conn = psycopg2.connect(**self.conn_kwargs)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._done.wait(self.interval):
+                    cur.execute("SELECT count(*), count(*) FILTER (WHERE state = 'active') "
+                                "FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()")
+                    self.samples.append(cur.fetchone())
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        totals = [s[0] for s in self.samples]
+        active = [s[1] for s in self.samples]
+        return {"server_connections_max": max(totals),
+                "server_connections_avg": round(sum(totals) / len(totals), 2),
+                "server_active_max": max(active),
+                "server_active_avg": round(sum(active) / len(active), 2)}
+
+
+# ---------- Virtual user ----------
+def virtual_user(n, args, recorder, bank, deadline, write_buffer):
+    rng = random.Random(args.seed + n)
+    username = f"lt_{args.run_id}_{n}"
+    password = "pw" + uuid.uuid4().hex[:12]
+
+    def think():
+        if args.think_ms:
+            time.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+    # Same work as utils.storage.save_user / validate_user: hash on the shared pool, one query each
+    hasher = get_hasher()
+    recorder.timed("register", lambda: save_user_pg(username, hasher.hash(password), f"{username}@example.com"))
+    think()
+    recorder.timed("login", lambda: hasher.verify(password, fetch_password_hash_pg(username))[0])
+
+    quizzes = 0
+    while time.monotonic() < deadline and (not args.quizzes or quizzes < args.quizzes):
+        session = QuizSession(bank.sample(args.questions, rng))
+        question = session.start()
+        while question is not None:
+            session.answer(rng.choice(question["options"]), rng.uniform(1, session.time_limit))
+            question = session.current_question
+        think()
+        if write_buffer is not None:
+            recorder.timed("save_result", write_buffer.add, "quiz_results", username=username,
+                           total_questions=session.total, correct_answers=session.score,
+                           event_id=session.session_id)
+        else:
+            recorder.timed("save_result", save_quiz_result_pg, username, session.total, session.score,
+                           session.session_id)
+        if write_buffer is not None:
+            recorder.timed("save_answers", write_buffer.add_many, "answer_events", [
+                {"answered_at": answered_at, "session_id": session.session_id, "question_id": question_id,
+                 "latency_ms": latency_ms, "position": position, "chosen": chosen, "correct": correct,
+                 "timed_out": timed_out}
+                for position, question_id, chosen, correct, timed_out, latency_ms, answered_at
+                in session.answer_events()])
+        else:
+            recorder.timed("save_answers", save_answer_events_pg, session.session_id, session.answer_events())
+        recorder.timed("fetch_history", fetch_user_results_pg, username)
+        if quizzes == 0 and recorder.timed("has_given_feedback", has_given_feedback, username) is False:
+            recorder.timed("save_feedback", save_feedback, username, rng.randint(1, 5), rng.random() < 0.8, "load test")
+        quizzes += 1
+        think()
+
+
+def cleanup(run_id):
+    pattern = f"lt\\_{run_id}\\_%"
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM answer_events WHERE session_id IN "
+                    "(SELECT event_id FROM quiz_results WHERE username LIKE %s)", (pattern,))
+        for table in ("quiz_results", "feedback", "users"):
+            cur.execute(f"DELETE FROM {table} WHERE username LIKE %s", (pattern,))
+
+
+def build_report(args, recorder, elapsed, pool, sampler, write_buffer, server_version):
+    operations = {}
+    for op in sorted(set(recorder.samples) | set(recorder.errors)):
+        values = sorted(recorder.samples.get(op, []))
+        ms = lambda v: None if v is None else round(v * 1000, 3)
+        operations[op] = {
+            "count": len(values),
+            "errors": recorder.errors.get(op, 0),
+            "throughput_per_s": round(len(values) / elapsed, 2),
+            "mean_ms": ms(sum(values) / len(values)) if values else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]) if values else None,
+        }
+    total_ops = sum(o["count"] for o in operations.values())
+    report = {
+        "run_id": args.run_id,
+        "started_at": args.started_at,
+        "server_version": server_version,
+        "config": {"users": args.users, "duration_s": args.duration, "quizzes": args.quizzes,
+                   "questions": args.questions, "think_ms": args.think_ms, "pool_max": args.pool_max,
+                   "save_mode": args.save_mode, "seed": args.seed},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(total_ops / elapsed, 2),
+        "operations": operations,
+        "connections": dict(pool_peak_in_use=pool.stats["peak_in_use"], pool_acquired=pool.stats["acquired"],
+                            pool_replaced=pool.stats["replaced"], **sampler.summary()),
+    }
+    if write_buffer is not None:
+        report["write_behind"] = dict(write_buffer.stats)
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['config']['users']} users, {report['elapsed_s']}s, "
+          f"{report['throughput_per_s']} ops/s ({report['server_version']})")
+    print(f"{'operation':<20}{'count':>8}{'err':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, o in report["operations"].items():
+        fmt = lambda v: "-" if v is None else f"{v:.2f}"
+        print(f"{op:<20}{o['count']:>8}{o['errors']:>6}{o['throughput_per_s']:>10}"
+              f"{fmt(o['p50_ms']):>10}{fmt(o['p95_ms']):>10}{fmt(o['p99_ms']):>10}")
+    print("connections:", ", ".join(f"{k}={v}" for k, v in report["connections"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the QuizMaster database paths")
+    parser.add_argument("--users", type=int, default=20, help="number of virtual users (threads)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds each user keeps taking quizzes")
+    parser.add_argument("--quizzes", type=int, default=0, help="stop each user after this many quizzes (0 = no limit)")
+    parser.add_argument("--questions", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between user actions")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which users are started")
+    parser.add_argument("--pool-max", type=int, default=8, help="maximum pooled connections")
+    parser.add_argument("--save-mode", choices=("direct", "write-behind"), default="direct",
+                        help="save results with a direct INSERT or through the write-behind buffer like main.py")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--pgserver", metavar="DIR", help="run against an embedded PostgreSQL in DIR")
+    parser.add_argument("--output", help="JSON report path (default data/loadtest/<timestamp>.json)")
+    parser.add_argument("--cleanup", action="store_true", help="delete the load-test users' rows afterwards")
+    args = parser.parse_args()
+    args.run_id = uuid.uuid4().hex[:8]
+    args.started_at = datetime.now().isoformat(timespec="seconds")
+
+    if args.pgserver:
+        try:
+            import pgserver
+        except ImportError:
+            raise SystemExit("--pgserver needs the pgserver package: pip install pgserver")
+        pgserver.get_server(args.pgserver, cleanup_mode=None)
+        conn_kwargs = dict(host=args.pgserver, database="postgres", user="postgres", password="", port=5432)
+    else:
+        conn_kwargs = dict(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                           password=os.getenv("DB_PASS"), port=os.getenv("DB_PORT", 5432))
+
+    pool = db.init_pool(minconn=1, maxconn=args.pool_max, **conn_kwargs)
+    migrate()
+    ensure_answer_partitions()
+    with db.cursor() as cur:
+        cur.execute("SHOW server_version")
+        server_version = "PostgreSQL " + cur.fetchone()[0]
+
+    write_buffer = None
+    if args.save_mode == "write-behind":
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        write_buffer = WriteBehindBuffer(spool_path=os.path.join(OUTPUT_DIR, f"spool-{args.run_id}.jsonl"))
+
+    bank = get_question_bank()
+    recorder = Recorder()
+    sampler = ConnectionSampler(conn_kwargs)
+    sampler.start()
+
+    print(f"Run {args.run_id}: {args.users} virtual users for {args.duration}s against {server_version}")
+    start = time.perf_counter()
+    deadline = time.monotonic() + args.ramp_up + args.duration
+    threads = []
+    for n in range(args.users):
+        t = threading.Thread(target=virtual_user, args=(n, args, recorder, bank, deadline, write_buffer),
+                             name=f"vu-{n}", daemon=True)
+        t.start()
+        threads.append(t)
+        if args.ramp_up:
+            time.sleep(args.ramp_up / args.users)
+    for t in threads:
+        t.join()
+    if write_buffer is not None:
+        flush_start = time.perf_counter()
+        # Flush explicitly: close() only reports a failed flush, and the spool
+        # must stay on disk (and the run fail) if the rows were not written
+        write_buffer.flush()
+        recorder.samples["write_behind_drain"] = [time.perf_counter() - flush_start]
+        write_buffer.close()
+        os.remove(write_buffer.spool_path)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    report = build_report(args, recorder, elapsed, pool, sampler, write_buffer, server_version)
+    if args.cleanup:
+        cleanup(args.run_id)
+    db.close_pool()
+
+    print_report(report)
+    output = args.output or os.path.join(OUTPUT_DIR, f"{args.started_at.replace(':', '')}-{args.run_id}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("Report written to", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,145 +1,123 @@
 # ================== IMPORTS AND DB SETUP ==================
+import time
+_PROCESS_START = time.perf_counter()  # reference point for time-to-first-frame
+
 import tkinter as tk
 import random
-import psycopg2
-import csv
 import os
-import smtplib
-import requests
-import base64
-from tkinter import filedialog
-from utils.file_handler import load_questions
-from score import ScoreTracker
-from dotenv import load_dotenv
+import threading
+from utils.question_bank import get_question_bank
+from utils.db_executor import DBExecutor
+from utils.config_cache import ConfigCache, fetch_env_from_github
+from utils.sound import get_sound_registry
+from utils.results_cache import ResultsCache
+from utils.storage import (
+    init_storage, close_storage, save_user, validate_user, find_username_by_email,
+    record_password_reset, update_password, prune_password_resets, save_quiz_result, save_answers,
+    fetch_user_results, fetch_user_results_after, has_given_feedback, save_feedback, save_comment, save_report,
+)
+from quiz_session import QuizSession
 from ui import QuizUI
-import pygame
 from datetime import datetime
-from email.message import EmailMessage
+# requests, dotenv, smtplib (via utils.mailer) and pygame (via utils.sound)
+# are imported on first use so the login screen can paint before any of
+# them is loaded
+
+class StartupError(Exception):
+    pass
 
 # ========== FETCH ENV VARIABLES FROM GITHUB WITHOUT LOCAL FILE ==========
 def set_env_from_github(token, repo, env_path):
-    api_url = f"https://api.github.com/repos/{repo}/contents/{env_path}"
-    headers = {"Authorization": f"token {token}"}
-    resp = requests.get(api_url, headers=headers)
-    if resp.status_code == 200:
-        content = resp.json()["content"]
-        decoded = base64.b64decode(content).decode()
-        for line in decoded.splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            # Set env variable only for current process, not visible to other users or processes
-            os.environ[key.strip()] = value.strip()
-    else:
-        print("Failed to fetch .env from GitHub:", resp.status_code, resp.text)
-        raise Exception("Could not fetch .env from GitHub")
+    # Served from the local encrypted cache when fresh; GitHub is only hit
+    # on expiry (in the background while the cached values are used)
+    cache = ConfigCache(token)
+    values = cache.get(lambda etag: fetch_env_from_github(token, repo, env_path, etag=etag))
+    for key, value in values.items():
+        # Set env variable only for current process, not visible to other users or processes
+        os.environ[key] = value
 
 # ========== SET THESE VARIABLES ==========
-load_dotenv(dotenv_path="data/detail.env")
-THING = os.getenv("THING")  # Only use from local details.env
 GITHUB_REPO = "RohithReddyP/envvar"
 GITHUB_ENV_PATH = "details.env"      # path in repo (at root)
 
-# Always fetch from GitHub using the token from local details.env
-if not THING:
-    print("Missing THING in data/details.env")
-    exit(1)
-set_env_from_github(THING, GITHUB_REPO, GITHUB_ENV_PATH)
-# Now all other env vars are set from GitHub
-
-# ========== ACCESS ENVIRONMENT VARIABLES DIRECTLY ==========
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASS")
-DB_PORT = os.getenv("DB_PORT", 5432)
-
-EMAIL_SENDER = os.getenv("EMAIL_ADDRESS")
-EMAIL_PASS = os.getenv("EMAIL_PASSWORD")
-
-# Check for missing environment variables (no print, just exit if missing)
-missing_vars = []
-for var, val in [
-    ("DB_HOST", DB_HOST),
-    ("DB_NAME", DB_NAME),
-    ("DB_USER", DB_USER),
-    ("DB_PASS", DB_PASS),
-    ("DB_PORT", DB_PORT),
-    ("EMAIL_ADDRESS", EMAIL_SENDER),
-    ("EMAIL_PASSWORD", EMAIL_PASS),
-]:
-    if not val:
-        missing_vars.append(var)
-
-if missing_vars:
-    print("Missing environment variables:", ", ".join(missing_vars))
-    exit(1)
-
-# Check DB connection details before connecting
-if not all([DB_HOST, DB_NAME, DB_USER, DB_PASS, DB_PORT]):
-    print("Database environment variables are not set properly.")
-    print("Please set DB_HOST, DB_NAME, DB_USER, DB_PASS, and DB_PORT in your environment.")
-    exit(1)
-
-try:
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        port=DB_PORT
-    )
-except Exception as e:
-    print("Could not connect to the PostgreSQL server:")
-    print(e)
-    print("Please ensure the server is running and the connection details are correct.")
-    exit(1)
-
-cur = conn.cursor()
-
-# ================== TABLE CREATION ==================
-cur.execute("""CREATE TABLE IF NOT EXISTS users (
-    id SERIAL PRIMARY KEY,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
-    email TEXT NOT NULL
-)""")
-cur.execute("""CREATE TABLE IF NOT EXISTS quiz_results (
-    id SERIAL PRIMARY KEY,
-    username TEXT NOT NULL,
-    total_questions INTEGER NOT NULL,
-    correct_answers INTEGER NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)""")
-cur.execute("""CREATE TABLE IF NOT EXISTS feedback (
-    username TEXT PRIMARY KEY,
-    rating INTEGER,
-    liked BOOLEAN,
-    feedback_note TEXT
-)""")
-cur.execute("""CREATE TABLE IF NOT EXISTS comments (
-    id SERIAL PRIMARY KEY,
-    username TEXT,
-    comment TEXT
-)""")
-cur.execute("""CREATE TABLE IF NOT EXISTS reports (
-    id SERIAL PRIMARY KEY,
-    username TEXT,
-    report TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)""")
-cur.execute("""CREATE TABLE IF NOT EXISTS password_resets (
-    id SERIAL PRIMARY KEY,
-    username TEXT,
-    email TEXT,
-    requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)""")
-conn.commit()
-pygame.mixer.init()
+# Filled in by init_backend() once the remote configuration has been fetched
+EMAIL_SENDER = None
+EMAIL_PASS = None
+mail_dispatcher = None
+
+# ================== BACKGROUND STARTUP ==================
+# Runs on a worker thread after the login screen has painted: loads the
+# configuration, opens the storage backend and makes sure the tables exist.
+# Raises StartupError with a user-facing message instead of exiting.
+def init_backend():
+    global EMAIL_SENDER, EMAIL_PASS, mail_dispatcher
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path="data/detail.env")
+    thing = os.getenv("THING")  # Only use from local details.env
+
+    # Always fetch from GitHub using the token from local details.env
+    if not thing:
+        raise StartupError("Missing THING in data/details.env")
+    try:
+        set_env_from_github(thing, GITHUB_REPO, GITHUB_ENV_PATH)
+    except Exception as e:
+        raise StartupError(f"Could not load configuration: {e}")
+    # Now all other env vars are set from GitHub
+
+    # ========== ACCESS ENVIRONMENT VARIABLES DIRECTLY ==========
+    # STORAGE_BACKEND=sqlite keeps everything in a local file (SQLITE_PATH) and needs no DB_* settings
+    backend = os.getenv("STORAGE_BACKEND", "postgres").lower()
+    db_host = os.getenv("DB_HOST")
+    db_name = os.getenv("DB_NAME")
+    db_user = os.getenv("DB_USER")
+    db_pass = os.getenv("DB_PASS")
+    db_port = os.getenv("DB_PORT", 5432)
+    db_pool_min = int(os.getenv("DB_POOL_MIN", 1))
+    db_pool_max = int(os.getenv("DB_POOL_MAX", 8))
+
+    EMAIL_SENDER = os.getenv("EMAIL_ADDRESS")
+    EMAIL_PASS = os.getenv("EMAIL_PASSWORD")
+
+    required = [("EMAIL_ADDRESS", EMAIL_SENDER), ("EMAIL_PASSWORD", EMAIL_PASS)]
+    if backend == "postgres":
+        required += [("DB_HOST", db_host), ("DB_NAME", db_name), ("DB_USER", db_user),
+                     ("DB_PASS", db_pass), ("DB_PORT", db_port)]
+    if backend not in ("postgres", "sqlite"):
+        raise StartupError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'postgres' or 'sqlite')")
+    missing_vars = [var for var, val in required if not val]
+    if missing_vars:
+        raise StartupError("Missing environment variables: " + ", ".join(missing_vars))
+
+    # Opening the storage also applies any pending schema migrations
+    if backend == "sqlite":
+        from utils.sqlite_storage import SQLITE_FILE
+        try:
+            init_storage("sqlite", path=os.getenv("SQLITE_PATH", SQLITE_FILE))
+        except Exception as e:
+            raise StartupError(f"Could not open the local database:\n{e}")
+    else:
+        try:
+            init_storage("postgres", host=db_host, database=db_name, user=db_user, password=db_pass, port=db_port,
+                         minconn=db_pool_min, maxconn=db_pool_max)
+        except Exception as e:
+            raise StartupError("Could not connect to the PostgreSQL server:\n"
+                               f"{e}\nPlease ensure the server is running and the connection details are correct.")
+    threading.Thread(target=prune_password_resets, args=(int(os.getenv("PASSWORD_RESET_RETENTION_DAYS", 30)),),
+                     name="prune-resets", daemon=True).start()
+
+    # SMTP_HOST / SMTP_PORT / SMTP_SSL may come from the remote config, so import after it is loaded
+    from utils.mailer import MailDispatcher
+    mail_dispatcher = MailDispatcher(EMAIL_SENDER, EMAIL_PASS)
+
+def init_audio():
+    # Initialise the mixer and decode every sound once, off the Tk thread
+    get_sound_registry().preload(background=False)
 
 # ================== PASSWORD RESET HELPER ==================
 def send_otp_email(to_email, otp):
+    # Queued on the background mail dispatcher; returns a Future that
+    # resolves once the message has been delivered (or finally failed)
+    from email.message import EmailMessage
     print(f"Attempting to send OTP to: {to_email}")
     msg = EmailMessage()
     msg.set_content(f"""
@@ -157,17 +135,9 @@ QuizMaster Team
     msg["Subject"] = "QuizMaster Password Reset OTP"
     msg["From"] = EMAIL_SENDER
     msg["To"] = to_email
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(EMAIL_SENDER, EMAIL_PASS)
-            smtp.send_message(msg)
-        print("OTP email sent successfully.")
-        return True
-    except Exception as e:
-        print("Email error:", e)
-        return False
+    return mail_dispatcher.send(msg)
 
-def reset_password_flow(root, prompt_login):
+def reset_password_flow(root, prompt_login, db_executor):
     win = tk.Toplevel(root)
     win.title("Forgot Password")
     center_window(win, 400, 250)
@@ -180,24 +150,36 @@ def reset_password_flow(root, prompt_login):
         email = email_entry.get().strip()
         if not email:
             return
-        cur.execute("SELECT username FROM users WHERE email=%s", (email,))
-        user_row = cur.fetchone()
-        if not user_row:
-            show_popup(root, "Error", "Not a valid registered email.")
-            return
-        # Insert into password_resets table
-        cur.execute("INSERT INTO password_resets (username, email) VALUES (%s, %s)", (user_row[0], email))
-        conn.commit()
         otp = str(random.randint(100000, 999999))
-        if send_otp_email(email, otp):
-            win.destroy()
-            verify_otp_popup(root, user_row[0], email, otp, prompt_login)
-        else:
-            show_popup(root, "Error", "Failed to send OTP. Please try again.")
+
+        def lookup_and_record():
+            reset_username = find_username_by_email(email)
+            if reset_username:
+                # Insert into password_resets table
+                record_password_reset(reset_username, email)
+            return reset_username
+
+        def on_lookup(reset_username):
+            if not reset_username:
+                show_popup(root, "Error", "Not a valid registered email.")
+                return
+            def on_sent(_):
+                print("OTP email sent successfully.")
+                win.destroy()
+                verify_otp_popup(root, reset_username, email, otp, prompt_login, db_executor)
+
+            def on_send_failed(e):
+                print("Email error:", e)
+                show_popup(root, "Error", "Failed to send OTP. Please try again.")
+
+            db_executor.watch(send_otp_email(email, otp), on_success=on_sent, on_error=on_send_failed)
+
+        db_executor.submit(lookup_and_record, on_success=on_lookup,
+                           on_error=lambda e: show_popup(root, "Error", "Could not reach the database. Please try again."))
 
     tk.Button(win, text="Send OTP", font=("Segoe UI", 11), bg="blue", fg="white", command=send_otp).pack(pady=15)
 
-def verify_otp_popup(root, username, email, otp, prompt_login):
+def verify_otp_popup(root, username, email, otp, prompt_login, db_executor):
     win = tk.Toplevel(root)
     win.title("Verify OTP")
     center_window(win, 400, 300)
@@ -212,11 +194,12 @@ def verify_otp_popup(root, username, email, otp, prompt_login):
     def verify():
         if otp_entry.get() == otp:
             if username:
-                cur.execute("UPDATE users SET password=%s WHERE username=%s", (new_pass.get().strip(), username))
-                conn.commit()
-                show_popup(root, "Success", "Password reset successfully!")
-                win.destroy()
-                prompt_login()
+                def on_updated(_):
+                    show_popup(root, "Success", "Password reset successfully!")
+                    win.destroy()
+                    prompt_login()
+                db_executor.submit(update_password, username, new_pass.get().strip(), on_success=on_updated,
+                                   on_error=lambda e: show_popup(root, "Error", "Could not reset password. Please try again."))
             else:
                 show_popup(root, "Success", "OTP verified! (No user update performed)")
                 win.destroy()
@@ -227,83 +210,12 @@ def verify_otp_popup(root, username, email, otp, prompt_login):
 
 def play_correct_if_full(score, total):
     if score == total:
-        try:
-            pygame.mixer.Sound("assets/correct.wav").play()
-        except Exception as e:
-            print("Sound error:", e)
+        get_sound_registry().play("correct")
 
-def save_user_pg(username, password, email):
-    try:
-        cur.execute("INSERT INTO users (username, password, email) VALUES (%s, %s, %s)", (username, password, email))
-        conn.commit()
-        return True
-    except psycopg2.Error:
-        conn.rollback()
-        return False
-
-def validate_user_pg(username, password):
-    cur.execute("SELECT * FROM users WHERE username=%s AND password=%s", (username, password))
-    return cur.fetchone() is not None
-
-def user_exists_pg(username):
-    cur.execute("SELECT * FROM users WHERE username=%s", (username,))
-    return cur.fetchone() is not None
-
-def save_quiz_result_pg(username, total_questions, correct_answers):
-    cur.execute("INSERT INTO quiz_results (username, total_questions, correct_answers) VALUES (%s, %s, %s)",
-                (username, total_questions, correct_answers))
-    conn.commit()
-
-def fetch_user_results_pg(username):
-    cur.execute("SELECT total_questions, correct_answers, created_at FROM quiz_results WHERE username=%s ORDER BY created_at DESC", (username,))
-    return cur.fetchall()
-
-def save_user_result_csv_local(username, total_questions, correct_answers):
-    save_path = filedialog.asksaveasfilename(
-        defaultextension=".csv",
-        filetypes=[("CSV files", "*.csv")],
-        title="Save quiz result as CSV"
-    )
-    if not save_path:
-        return
-    file_exists = os.path.isfile(save_path)
-    with open(save_path, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(["Username", "Total Questions", "Correct Answers"])
-        writer.writerow([username, total_questions, correct_answers])
-
-def has_given_feedback(username):
-    cur.execute("SELECT 1 FROM feedback WHERE username=%s", (username,))
-    return cur.fetchone() is not None
-
-def save_feedback(username, rating, liked, note):
-    try:
-        cur.execute("INSERT INTO feedback (username, rating, liked, feedback_note) VALUES (%s, %s, %s, %s)",
-                    (username, rating, liked, note))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        print("Feedback save error:", e)
-
-def save_comment(username, comment_text):
-    try:
-        cur.execute("INSERT INTO comments (username, comment) VALUES (%s, %s)", (username, comment_text))
-        conn.commit()
-    except:
-        conn.rollback()
-
-def save_report(username, report_text):
-    try:
-        cur.execute("INSERT INTO reports (username, report) VALUES (%s, %s)", (username, report_text))
-        conn.commit()
-    except:
-        conn.rollback()
-
-def show_feedback_popup(ui, username):
+def show_feedback_popup(ui, username, db_executor):
     def submit_feedback(rating, liked, note):
-        save_feedback(username, rating, liked, note)
-        ui.show_popup("Thank You!", "Your feedback has been recorded.", "OK")
+        db_executor.submit(save_feedback, username, rating, liked, note,
+                           on_success=lambda _: ui.show_popup("Thank You!", "Your feedback has been recorded.", "OK"))
     ui.show_feedback_popup(lambda rating, liked, note: submit_feedback(rating, liked, note))
 
 # ================== MAIN FUNCTION ==================
@@ -331,6 +243,38 @@ def main():
 
     username = ""
     ui = None
+    db_executor = DBExecutor(root)
+    # Shared by history, progress graph and CSV export: one small query (or none) per view switch
+    results_cache = ResultsCache(fetch_user_results, fetch_user_results_after)
+
+    def save_result(uname, session):
+        # With PostgreSQL the result is spooled locally and batched by the write-behind buffer;
+        # the per-answer events go in as one COPY
+        created_at = save_quiz_result(uname, session.total, session.score, session.session_id)
+        results_cache.record(uname, session.total, session.score, created_at)
+        save_answers(session.session_id, session.answer_events())
+
+    # --- Staged startup: paint the login screen, then load config/DB/audio in the background ---
+    def on_startup_failed(e):
+        print(e)
+        show_popup(root, "Startup Error", str(e), "Exit")
+        root.destroy()
+
+    def on_backend_ready(_):
+        print(f"Backend ready after {(time.perf_counter() - _PROCESS_START) * 1000:.0f} ms")
+
+    started = {"value": False}
+    def on_first_frame():
+        if started["value"]:
+            return
+        started["value"] = True
+        first_frame_ms = (time.perf_counter() - _PROCESS_START) * 1000
+        print(f"Time to first frame: {first_frame_ms:.0f} ms")
+        startup = db_executor.submit(init_backend, busy=False, on_success=on_backend_ready, on_error=on_startup_failed)
+        db_executor.set_gate(startup)  # queries issued before startup finishes wait for it
+        threading.Thread(target=init_audio, name="audio-init", daemon=True).start()
+
+    root.bind("<Map>", lambda e: root.after_idle(on_first_frame) if e.widget is root else None)
     session_attempts = []
 
     # --- Helper to clear main window content ---
@@ -340,13 +284,17 @@ def main():
 
     def do_logout():
         nonlocal username, ui
+        results_cache.forget(username)
         username = ""
         ui = None
         clear_root()
         prompt_login()
 
     def show_history():
-        results = fetch_user_results_pg(username)
+        db_executor.submit(results_cache.get, username, on_success=render_history,
+                           on_error=lambda e: show_popup(root, "Error", "Could not load your quiz history."))
+
+    def render_history(results):
         popup = tk.Toplevel(root)
         popup.title("Past Scores")
         center_window(popup, 400, 300)
@@ -368,7 +316,7 @@ def main():
         def submit_comment():
             comment_text = comment_box.get("1.0", "end").strip()
             if comment_text:
-                save_comment(username, comment_text)
+                db_executor.submit(save_comment, username, comment_text)
                 popup.destroy()
         tk.Button(popup, text="Submit", command=submit_comment, bg="#28a745", fg="white").pack(pady=10)
 
@@ -383,7 +331,7 @@ def main():
         def submit_report():
             report_text = report_box.get("1.0", "end").strip()
             if report_text:
-                save_report(username, report_text)
+                db_executor.submit(save_report, username, report_text)
                 popup.destroy()
         tk.Button(popup, text="Submit", command=submit_report, bg="#dc3545", fg="white").pack(pady=10)
 
@@ -435,7 +383,7 @@ def main():
                 # Red warning about timer
                 tk.Label(
                     desc_frame,
-                    text="⚠ Each question has only 20 seconds!",
+                    text=f"⚠ Each question has only {ui.question_time_limit} seconds!",
                     font=("Segoe UI", 15, "bold"),
                     bg="white",
                     fg="red"
@@ -454,18 +402,16 @@ def main():
                 ).pack()
 
             def ask_and_start(total_q):
-                all_questions = load_questions()
-                questions = random.sample(all_questions, k=min(total_q, len(all_questions)))
-                tracker = ScoreTracker(len(questions))
-                idx = [0]
-                user_answers = []
+                session = QuizSession(get_question_bank().sample(total_q), ui.question_time_limit)
+                questions = session.questions
 
                 # --- Helper to show score popup ---
                 def show_score_popup(ui_ref):
-                    score = tracker.get_score()
-                    total = len(questions)
+                    score = session.score
+                    total = session.total
                     play_correct_if_full(score, total)
-                    save_quiz_result_pg(username, total, score)
+                    db_executor.submit(save_result, username, session,
+                                       on_error=lambda e: print("Quiz result save error:", e))
                     session_attempts.append({"username": username, "total": total, "correct": score})
 
                     pop = tk.Toplevel(root)
@@ -493,8 +439,11 @@ def main():
                               command=show_solution_attached).pack(side="left", padx=8)
 
                     root.wait_window(pop)
-                    if not has_given_feedback(username):
-                        show_feedback_popup(ui_ref, username)
+
+                    def after_feedback_check(given):
+                        if not given:
+                            show_feedback_popup(ui_ref, username, db_executor)
+                    db_executor.submit(has_given_feedback, username, on_success=after_feedback_check)
 
                 # --- Solution attached to main window ---
                 def show_solution_in_main():
@@ -508,7 +457,7 @@ def main():
                         for widget in sol_frame.winfo_children():
                             widget.destroy()
                         q = questions[idx]
-                        user_ans = user_answers[idx] if idx < len(user_answers) else ""
+                        user_ans = session.answers[idx] if idx < len(session.answers) else ""
                         correct_ans = q["answer"]
 
                         # Centered content frame
@@ -555,33 +504,26 @@ def main():
 
                     render(0)
 
-                # --- New: handle timeout and go to next question ---
-                def handle_timeout():
-                    user_answers.append("")
-                    idx[0] += 1
-                    if idx[0] < len(questions):
-                        current = questions[idx[0]]
-                        if ui:
-                            ui.show_question(current["question"], current["options"], submit, idx[0], len(questions), on_timeout=handle_timeout)
-                    else:
+                # --- The UI only renders the session's current question and forwards actions ---
+                def show_current():
+                    if session.finished:
                         show_score_popup(ui)
+                        return
+                    current = session.current_question
+                    if ui:
+                        ui.show_question(current["question"], current["options"], submit, session.index,
+                                         session.total, on_timeout=handle_timeout)
+
+                def handle_timeout():
+                    session.timeout(ui.last_answer_latency if ui else None)
+                    show_current()
 
-                # --- Submit answer handler ---
                 def submit(ans):
-                    user_answers.append(ans)
-                    if ans == questions[idx[0]]["answer"]:
-                        tracker.increment()
-                    idx[0] += 1
-                    if idx[0] < len(questions):
-                        current = questions[idx[0]]
-                        if ui:
-                            ui.show_question(current["question"], current["options"], submit, idx[0], len(questions), on_timeout=handle_timeout)
-                    else:
-                        show_score_popup(ui)
-                # --- Show first question, pass on_timeout handler ---
-                current = questions[idx[0]]
-                if ui:
-                    ui.show_question(current["question"], current["options"], submit, idx[0], len(questions), on_timeout=handle_timeout)
+                    session.answer(ans, ui.last_answer_latency if ui else None)
+                    show_current()
+
+                session.start()
+                show_current()
 
             show_description()
 
@@ -619,22 +561,36 @@ def main():
             pass_entry = tk.Entry(login_frame, font=("Segoe UI", 12), width=34, show="*")
             pass_entry.pack()
             def handle_login():
-                nonlocal username, ui
                 uname = name_entry.get().strip()
                 pwd = pass_entry.get().strip()
-                if not validate_user_pg(uname, pwd):
+                login_btn.config(state="disabled")
+                db_executor.submit(validate_user, uname, pwd,
+                                   on_success=lambda ok: on_login_checked(uname, ok),
+                                   on_error=on_login_error)
+
+            def on_login_error(e):
+                if login_btn.winfo_exists():
+                    login_btn.config(state="normal")
+                show_popup(root, "Error", "Could not reach the database. Please try again.")
+
+            def on_login_checked(uname, ok):
+                nonlocal username, ui
+                if not ok:
+                    if login_btn.winfo_exists():
+                        login_btn.config(state="normal")
                     show_popup(root, "Invalid Login", "Incorrect username or password.")
                     return
                 clear_root()
                 username = uname
-                ui = QuizUI(root, start_quiz, username, do_logout, show_history, fetch_user_results_pg)
+                ui = QuizUI(root, start_quiz, username, do_logout, show_history, results_cache.get, db_executor)
                 btn_frame = tk.Frame(ui.container, bg="white")
                 btn_frame.pack(anchor="ne", pady=5, padx=10)
                 tk.Button(btn_frame, text="Comment", command=open_comment_popup, bg="orange", fg="white").pack(side="top", pady=2)
                 tk.Button(btn_frame, text="Report", command=open_report_popup, bg="red", fg="white").pack(side="top", pady=2)
                 ui.show_welcome()
-            tk.Button(login_frame, text="Login", width=16, font=("Segoe UI", 12), bg="#007bff", fg="white", command=handle_login).pack(pady=28)
-            tk.Button(login_frame, text="Forgot Password?", font=("Segoe UI", 10, "underline"), fg="blue", bg="white", bd=0, cursor="hand2", command=lambda: [clear_root(), reset_password_flow(root, prompt_login)]).pack()
+            login_btn = tk.Button(login_frame, text="Login", width=16, font=("Segoe UI", 12), bg="#007bff", fg="white", command=handle_login)
+            login_btn.pack(pady=28)
+            tk.Button(login_frame, text="Forgot Password?", font=("Segoe UI", 10, "underline"), fg="blue", bg="white", bd=0, cursor="hand2", command=lambda: [clear_root(), reset_password_flow(root, prompt_login, db_executor)]).pack()
 
         def open_register():
             clear_root()
@@ -666,23 +622,35 @@ def main():
                 if not uname or not pwd or not email:
                     show_popup(root, "Missing Info", "Please enter username, password, and email.")
                     return
-                if user_exists_pg(uname):
-                    show_popup(root, "Already Exists", "Username already exists. Choose another.")
-                    return
-                if save_user_pg(uname, pwd, email):
-                    def after_success():
-                        clear_root()
-                        prompt_login()  # Show login/register choice again
-                    show_popup(root, "Success", f"User '{uname}' registered successfully.", "Login Now")
-                    root.after(100, after_success)
-                else:
+                def on_registered(created):
+                    # save_user checks for an existing username and inserts in one round trip
+                    if not created:
+                        show_popup(root, "Already Exists", "Username already exists. Choose another.")
+                    else:
+                        def after_success():
+                            clear_root()
+                            prompt_login()  # Show login/register choice again
+                        show_popup(root, "Success", f"User '{uname}' registered successfully.", "Login Now")
+                        root.after(100, after_success)
+                    if register_btn.winfo_exists():
+                        register_btn.config(state="normal")
+
+                def on_register_error(e):
+                    if register_btn.winfo_exists():
+                        register_btn.config(state="normal")
                     show_popup(root, "Error", "Registration failed. Try again.")
-            tk.Button(reg_frame, text="Register", width=16, font=("Segoe UI", 12), bg="#28a745", fg="white", command=handle_register).pack(pady=28)
+
+                register_btn.config(state="disabled")
+                db_executor.submit(save_user, uname, pwd, email, on_success=on_registered, on_error=on_register_error)
+            register_btn = tk.Button(reg_frame, text="Register", width=16, font=("Segoe UI", 12), bg="#28a745", fg="white", command=handle_register)
+            register_btn.pack(pady=28)
 
     prompt_login()
     root.mainloop()
-    cur.close()
-    conn.close()
+    db_executor.shutdown()
+    if mail_dispatcher is not None:
+        mail_dispatcher.close(timeout=5)
+    close_storage()
 
 # ================== POPUP UTILITIES ==================
 def ask_question_count(root):
@@ -737,5 +705,3 @@ def center_window(win, width, height):
 
 if __name__ == "__main__":
     main()
-if __name__ == "__main__":
-    main()
@@ -0,0 +1,150 @@
+import time
+import uuid
+from array import array
+from datetime import datetime
+
+from score import ScoreTracker
+
+READY, IN_PROGRESS, FINISHED = "ready", "in_progress", "finished"
+
+
+# ================== QUIZ SESSION ENGINE ==================
+# UI-independent state machine for one quiz attempt:
+#   ready --start()--> in_progress --answer()/timeout() x N--> finished
+# It owns the question list, the answers given, per-question latency and
+# timeout flags, and scores through ScoreTracker. The Tk UI only displays
+# current_question and forwards the user's actions, so the same engine
+# can be driven headlessly by tests, benchmarks and load simulations.
+# session_id becomes the quiz_results event_id and ties the per-answer
+# rows (answer_events) to it.
+class QuizSession:
+    __slots__ = ("session_id", "questions", "time_limit", "tracker", "state", "index",
+                 "answers", "latencies", "timed_out", "answered_at", "_shown_at")
+
+    def __init__(self, questions, time_limit=20):
+        self.session_id = uuid.uuid4()
+        self.questions = questions
+        self.time_limit = time_limit
+        self.tracker = ScoreTracker(len(questions))
+        self.state = READY
+        self.index = 0
+        self.answers = []                # chosen option text, "" when not answered
+        self.latencies = array("d")      # seconds spent on each question
+        self.timed_out = bytearray()     # 1 where the time limit ran out
+        self.answered_at = array("d")    # wall-clock time.time() of each answer
+        self._shown_at = None
+
+    # ---------- Progress ----------
+    @property
+    def total(self):
+        return len(self.questions)
+
+    @property
+    def score(self):
+        return self.tracker.get_score()
+
+    @property
+    def finished(self):
+        return self.state == FINISHED
+
+    @property
+    def current_question(self):
+        return self.questions[self.index] if self.state == IN_PROGRESS else None
+
+    def start(self):
+        if self.state != READY:
+            raise RuntimeError(f"Cannot start a session that is {self.state}")
+        self.state = IN_PROGRESS if self.questions else FINISHED
+        self._shown_at = time.monotonic()
+        return self.current_question
+
+    # ---------- Transitions ----------
+    def _record(self, choice, latency, timed_out):
+        if self.state != IN_PROGRESS:
+            raise RuntimeError(f"Cannot answer a session that is {self.state}")
+        now = time.monotonic()
+        if latency is None:
+            latency = now - self._shown_at
+        correct = not timed_out and choice == self.questions[self.index]["answer"]
+        if correct:
+            self.tracker.increment()
+        self.answers.append(choice)
+        self.latencies.append(latency)
+        self.timed_out.append(1 if timed_out else 0)
+        self.answered_at.append(time.time())
+        self.index += 1
+        self._shown_at = now
+        if self.index >= len(self.questions):
+            self.state = FINISHED
+        return correct
+
+    def answer(self, choice, latency=None):
+        # Returns whether the answer was correct; latency defaults to the time since the question was shown
+        return self._record(choice, latency, False)
+
+    def timeout(self, latency=None):
+        return self._record("", self.time_limit if latency is None else latency, True)
+
+    # ---------- Review ----------
+    def review(self):
+        # One entry per question asked, for the solution screen and analytics
+        return [
+            {
+                "question": q,
+                "chosen": self.answers[i],
+                "correct": self.answers[i] == q["answer"],
+                "latency": self.latencies[i],
+                "timed_out": bool(self.timed_out[i]),
+            }
+            for i, q in enumerate(self.questions[:len(self.answers)])
+        ]
+
+    def answer_events(self):
+        # (position, question_id, chosen option index or -1, correct, timed_out, latency_ms, answered_at)
+        # per question answered; the row layout storage.save_answers() ingests
+        rows = []
+        for i, q in enumerate(self.questions[:len(self.answers)]):
+            chosen = self.answers[i]
+            options = q["options"]
+            timed_out = bool(self.timed_out[i])
+            rows.append((
+                i,
+                q["question_id"],
+                options.index(chosen) if not timed_out and chosen in options else -1,
+                not timed_out and chosen == q["answer"],
+                timed_out,
+                round(self.latencies[i] * 1000),
+                datetime.fromtimestamp(self.answered_at[i]),
+            ))
+        return rows
+
+
+# ================== BENCHMARK ==================
+# python quiz_session.py [sessions] [questions_per_session]
+# Plays random sessions headlessly to measure engine throughput.
+if __name__ == "__main__":
+    import random
+    import sys
+
+    from utils.question_bank import get_question_bank
+
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    bank = get_question_bank()
+    rng = random.Random(7)
+
+    start = time.perf_counter()
+    answered = 0
+    for _ in range(sessions):
+        session = QuizSession(bank.sample(per_session, rng))
+        question = session.start()
+        while question is not None:
+            if rng.random() < 0.05:
+                session.timeout()
+            else:
+                session.answer(rng.choice(question["options"]), latency=rng.uniform(1, 20))
+            answered += 1
+            question = session.current_question
+    elapsed = time.perf_counter() - start
+    print(f"{sessions} sessions / {answered} answers in {elapsed:.2f}s "
+          f"({sessions / elapsed:,.0f} sessions/s, {answered / elapsed:,.0f} answers/s)")
@@ -0,0 +1,94 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import storage
+from utils.sqlite_storage import SQLiteStorage
+
+
+# ================== FIXTURES ==================
+@pytest.fixture
+def backend(tmp_path):
+    # A fresh database file per test, also installed as the module-level backend
+    store = storage.init_storage("sqlite", path=str(tmp_path / "quizmaster.db"))
+    yield store
+    storage.close_storage()
+
+
+def _save_results(backend, username, count):
+    for n in range(count):
+        backend.save_quiz_result(username, 10, n)
+    return [row[3] for row in sorted(backend.fetch_user_results(username), key=lambda row: row[3])]
+
+
+# ================== USERS ==================
+def test_save_user_rejects_duplicate_username(backend):
+    assert backend.save_user("alice", "hash-1", "alice@example.com") is True
+    assert backend.save_user("alice", "hash-2", "other@example.com") is False
+    # The first registration is left untouched
+    assert backend.get_password_hash("alice") == "hash-1"
+    assert backend.find_username_by_email("alice@example.com") == "alice"
+    assert backend.find_username_by_email("other@example.com") is None
+
+
+def test_save_user_helper_stores_a_hash(backend):
+    assert storage.save_user("bob", "secret", "bob@example.com") is True
+    assert storage.save_user("bob", "secret", "bob@example.com") is False
+    assert backend.get_password_hash("bob") != "secret"
+
+
+def test_validate_user(backend):
+    storage.save_user("carol", "right", "carol@example.com")
+    assert storage.validate_user("carol", "right") is True
+    assert storage.validate_user("carol", "wrong") is False
+    assert storage.validate_user("nobody", "right") is False
+
+
+def test_validate_user_upgrades_plaintext_password(backend):
+    backend.save_user("dave", "legacy", "dave@example.com")
+    assert storage.validate_user("dave", "legacy") is True
+    # The rehash is stored from a background callback
+    deadline = time.monotonic() + 10
+    while backend.get_password_hash("dave") == "legacy" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.get_password_hash("dave") != "legacy"
+    assert storage.validate_user("dave", "legacy") is True
+
+
+# ================== QUIZ RESULTS ==================
+def test_fetch_user_results_after(backend):
+    ids = _save_results(backend, "erin", 4)
+    _save_results(backend, "frank", 2)
+    rows = backend.fetch_user_results_after("erin", ids[1])
+    assert [row[3] for row in rows] == [ids[3], ids[2]]  # last inserted first
+    assert [row[1] for row in rows] == [3, 2]
+    assert all(isinstance(row[2], datetime) for row in rows)
+    assert backend.fetch_user_results_after("erin", ids[-1]) == []
+
+
+def test_stream_user_results_chunks_in_id_order(backend):
+    ids = _save_results(backend, "gina", 7)
+    _save_results(backend, "hank", 3)
+    chunks = list(backend.stream_user_results("gina", chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row[3] for chunk in chunks for row in chunk] == ids
+
+
+def test_stream_user_results_after_and_since(backend):
+    ids = _save_results(backend, "ivan", 5)
+    after = [row[3] for chunk in backend.stream_user_results("ivan", after_id=ids[2]) for row in chunk]
+    assert after == ids[3:]
+    future = datetime.now() + timedelta(days=1)
+    assert list(backend.stream_user_results("ivan", since=future)) == []
+    assert list(backend.stream_user_results("nobody")) == []
+
+
+def test_reopen_keeps_data(backend, tmp_path):
+    backend.save_user("judy", "hash", "judy@example.com")
+    storage.close_storage()
+    reopened = SQLiteStorage(path=str(tmp_path / "quizmaster.db"))
+    try:
+        assert reopened.user_exists("judy")
+    finally:
+        reopened.close()
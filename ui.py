@@ -1,17 +1,18 @@
 import tkinter as tk
 from tkinter import ttk
-import pygame
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.animation as animation
-import csv
+# matplotlib is imported lazily: it dominates startup time and is only
+# needed once "View Progress" is opened
 from tkinter import filedialog
 import os
+from utils.timer import TimerService
+from utils.sound import get_sound_registry
 
 class QuizUI:
-    def __init__(self, master, on_start_quiz, username, on_logout, on_view_history, fetch_results_func):
+    def __init__(self, master, on_start_quiz, username, on_logout, on_view_history, fetch_results_func, db_executor,
+                 question_time_limit=20):
         self.on_view_history = on_view_history
         self.fetch_results_func = fetch_results_func
+        self.db_executor = db_executor  # runs fetch_results_func off the Tk thread
 
         self.root = master
         self.root.configure(bg="#001f3f")
@@ -22,11 +23,17 @@ class QuizUI:
         self.username = username
 
         self.timer_label = None
-        self.remaining_time = 0
-        self.timer_id = None
+        self.timer_service = TimerService(self.root)  # one shared tick for every countdown
+        self.countdown = None
+        self.question_time_limit = question_time_limit
+        self.last_answer_latency = None  # seconds the user took on the previous question
         self.selected = None
         self.submit_btn = None
         self.time_up_handler = None
+        self.question_view = None
+        self.on_submit_answer = None
+        self.progress_graph = None
+        self._view = 0  # bumped by clear(); async results for an older screen are dropped
 
         self.style = ttk.Style()
         self.style.configure("Cool.TRadiobutton", font=("Segoe UI", 14), padding=8)
@@ -38,19 +45,11 @@ class QuizUI:
         self.main_content = tk.Frame(self.container, bg="#001f3f")
         self.main_content.pack(fill="both", expand=True)
 
-        pygame.mixer.init()
-        self.sounds = {
-            "click": pygame.mixer.Sound("assets/click.wav"),
-            "correct": pygame.mixer.Sound("assets/correct.wav"),
-            "wrong": pygame.mixer.Sound("assets/wrong.wav"),
-            "timeout": pygame.mixer.Sound("assets/timeout.mp3")
-        }
+        # Shared, already-decoded sounds (preloaded in the background at startup)
+        self.sounds = get_sound_registry()
 
     def play_sound(self, name):
-        try:
-            self.sounds[name].play()
-        except Exception as e:
-            print(f"Sound error: {e}")
+        self.sounds.play(name)
 
     def animate_fade_in(self, widget, delay=10, steps=20):
         widget.attributes('-alpha', 0.0)
@@ -229,13 +228,7 @@ class QuizUI:
         self.display_line_graph()
 
     def download_results(self):
-        # Fetch all quiz results for the current user
-        results = self.fetch_results_func(self.username)
-        if not results:
-            self.show_popup("No Data", "You have no quiz results to download.")
-            return
-
-        # Ask user where to save the CSV
+        # Ask where to save on the Tk thread, then stream only the new results into the file in the background
         save_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
             filetypes=[("CSV files", "*.csv")],
@@ -244,139 +237,81 @@ class QuizUI:
         )
         if not save_path:
             return
-
-        # Prepare new results as a set of tuples for uniqueness
-        new_rows = set(
-            (row[0], row[1], row[2].strftime("%Y-%m-%d %H:%M:%S"))
-            for row in results
-        )
-
-        # If file exists, read existing rows to avoid duplicates
-        existing_rows = set()
-        if os.path.isfile(save_path):
-            with open(save_path, mode="r", newline="", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                headers = next(reader, None)
-                for row in reader:
-                    if len(row) == 3:
-                        existing_rows.add(tuple(row))
-
-        # Only add new rows that are not already in the file
-        rows_to_write = new_rows - existing_rows
-
-        # Write header if file does not exist, else append
-        write_header = not os.path.isfile(save_path)
-        with open(save_path, mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            if write_header:
-                writer.writerow(["Total Questions", "Correct Answers", "Attempted At"])
-            for row in sorted(rows_to_write, key=lambda x: x[2]):
-                writer.writerow(row)
-
-        if rows_to_write:
-            self.show_popup("Success", f"New results appended to:\n{save_path}")
-        else:
+        from utils.results_export import export_results_csv
+        self.db_executor.submit(export_results_csv, self.username, save_path,
+                                on_success=lambda count: self._on_results_exported(save_path, count),
+                                on_error=lambda e: self.show_popup("Error", "Could not export your quiz results."))
+
+    def _on_results_exported(self, save_path, count):
+        if count:
+            self.show_popup("Success", f"{count} new result(s) appended to:\n{save_path}")
+        elif os.path.isfile(save_path):
             self.show_popup("No New Results", "All your results are already in the CSV file.")
+        else:
+            self.show_popup("No Data", "You have no quiz results to download.")
 
     def display_line_graph(self):
+        view = self._view
+        self.db_executor.submit(self.fetch_results_func, self.username,
+                                on_success=lambda results: self._render_line_graph(results, view),
+                                on_error=lambda e: self.show_popup("Error", "Could not load your quiz history."))
+
+    def _render_line_graph(self, results, view):
+        if view != self._view or not self.main_content.winfo_exists():
+            return  # the user moved to another screen (quiz, logout) while history loaded
         self.clear()
-        results = self.fetch_results_func(self.username)
         if not results:
             self.show_popup("No Data", "You have no quiz history to visualize.")
             return
 
-        scores = [r[1] for r in results[::-1]]
-        questions = [r[0] for r in results[::-1]]
-        labels = [f"Q{i+1}" for i in range(len(results))]
-
-        fig, ax = plt.subplots(figsize=(7, 5))
-        canvas = FigureCanvasTkAgg(fig, master=self.main_content)
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-        line1, = ax.plot([], [], 'g-o', label="Correct")
-        line2, = ax.plot([], [], 'r--x', label="Total")
-        ax.set_xlim(0, len(labels) - 1)
-        ax.set_ylim(0, max(questions + [1]))
-        ax.set_xticks(range(len(labels)))
-        ax.set_xticklabels(labels)
-        ax.set_title("User Quiz Progress")
-        ax.set_xlabel("Attempts")
-        ax.set_ylabel("Questions")
-        ax.legend()
-
-        def update(frame):
-            x = list(range(frame + 1))
-            line1.set_data(x, scores[:frame + 1])
-            line2.set_data(x, questions[:frame + 1])
-            return line1, line2
-
-        ani = animation.FuncAnimation(fig, update, frames=len(labels), interval=800, blit=True, repeat=False)
-        canvas.draw()
+        # One figure per UI, kept across visits; only attempts newer than the last visit are added
+        if self.progress_graph is None:
+            self.progress_graph = ProgressGraph()
+        self.progress_graph.update(results)
+        self.progress_graph.attach(self.main_content).pack(fill='both', expand=True)
+        self.progress_graph.reveal(self.root)
 
         tk.Button(self.main_content, text="Back", font=("Segoe UI", 12), bg="#6c757d", fg="white",
                   command=lambda: (self.play_sound("click"), self.show_welcome())).pack(pady=10)
 
-    def show_question(self, question, options, on_submit, question_index, total_questions, on_timeout=None):
-        self.clear()
-        self.main_content.update_idletasks()  # Force geometry update after clearing
-
-        frame = tk.Frame(self.main_content, bg="white", padx=30, pady=30, bd=2, relief="ridge")
-        frame.pack(expand=True, fill="both", padx=20, pady=20)
-
-        progress = int((question_index + 1) / total_questions * 100)
-        ttk.Progressbar(frame, value=progress, maximum=100, length=300).pack(pady=(0, 20))
-
-        tk.Label(frame, text=f"Question {question_index + 1} of {total_questions}",
-                 font=("Segoe UI", 14, "italic"), bg="white", anchor="w").pack(fill="x")
-
-        tk.Label(frame, text=question, font=("Segoe UI", 18, "bold"), wraplength=900,
-                 bg="white", justify="left").pack(anchor="w", pady=(20, 10))
-
-        self.selected = tk.StringVar(value="")
-
-        for opt in options:
-            ttk.Radiobutton(frame, text=opt, variable=self.selected, value=opt,
-                            style="Cool.TRadiobutton").pack(anchor="w", pady=6)
-
-        self.timer_label = tk.Label(frame, text="Time: 20", font=("Segoe UI", 14), fg="red", bg="white")
-        self.timer_label.pack(pady=15)
-
-        self.submit_btn = tk.Button(frame, text="Submit", font=("Segoe UI", 14, "bold"),
-                                    bg="#28a745", fg="white", activebackground="#218838",
-                                    activeforeground="white", width=12,
-                                    command=lambda: self.submit_wrapper(on_submit))
-        self.submit_btn.pack(pady=10)
-
-        self.start_timer(20)
-
-        self.time_up_handler = on_timeout  # Store the timeout handler for use in update_timer
-
-    
     def start_timer(self, seconds):
-        self.remaining_time = seconds
-        self.update_timer()
-
-    def update_timer(self):
-        # Prevent updating timer_label if it has been destroyed
-        if not hasattr(self, "timer_label") or not self.timer_label.winfo_exists():
+        # The timer label outlives each question, so stop any countdown still running
+        if self.countdown is not None:
+            self.countdown.stop()
+        self.countdown = self.timer_service.start(seconds, on_tick=self.update_timer, on_expire=self.on_time_up)
+
+    def pause_timer(self):
+        if self.countdown is not None:
+            self.countdown.pause()
+
+    def resume_timer(self):
+        if self.countdown is not None:
+            self.countdown.resume()
+
+    def update_timer(self, seconds_left):
+        if self.question_view is not None and self.question_view.exists():
+            self.timer_label.config(text=f"Time: {seconds_left}")
+
+    def on_time_up(self):
+        self.last_answer_latency = self.countdown.elapsed()
+        if self.question_view is None or not self.question_view.exists():
+            # The quiz screen was left (e.g. logout) while the countdown ran
             return
-        self.timer_label.config(text=f"Time: {self.remaining_time}")
-        if self.remaining_time > 0:
-            self.remaining_time -= 1
-            self.timer_id = self.root.after(1000, self.update_timer)
-        else:
-            self.submit_btn.config(state="disabled")
-            self.show_popup("⏰ Time's Up", "Time's up for this question! Click OK to continue.",
-                            "Next", callback=self.time_up_handler, sound="timeout")
+        self.submit_btn.config(state="disabled")
+        self.show_popup("⏰ Time's Up", "Time's up for this question! Click OK to continue.",
+                        "Next", callback=self.time_up_handler, sound="timeout")
 
     def submit_wrapper(self, on_submit, time_up=False):
-        if self.timer_id:
-            self.root.after_cancel(self.timer_id)
+        if self.countdown is not None:
+            self.last_answer_latency = self.countdown.stop()
         self.submit_btn.config(state="disabled")
         self.play_sound("timeout" if time_up else "click")
         on_submit(self.selected.get() if not time_up else "")
 
     def clear(self):
+        self._view += 1
+        if self.progress_graph is not None:
+            self.progress_graph.detach()
         try:
             if hasattr(self, "main_content") and self.main_content.winfo_exists():
                 # Only destroy children widgets, do not destroy self.main_content itself
@@ -393,38 +328,198 @@ class QuizUI:
             self.main_content = tk.Frame(self.container, bg="#001f3f")
             self.main_content.pack(fill="both", expand=True)
 
-    def show_question(self, question, options, on_submit, question_index, total_questions, on_timeout=None):
+    def show_question(self, question, options, on_submit, question_index, total_questions, on_timeout=None,
+                      time_limit=None):
         self.ensure_main_content()
-        self.clear()
-        self.main_content.update_idletasks()  # Force geometry update after clearing
+        # Build the question view once per quiz and only re-configure it afterwards
+        if self.question_view is None or not self.question_view.exists():
+            self.clear()
+            self.question_view = QuestionView(self.main_content, lambda: self.submit_wrapper(self.on_submit_answer))
+            self.selected = self.question_view.selected
+            self.timer_label = self.question_view.timer_label
+            self.submit_btn = self.question_view.submit_btn
+
+        self.on_submit_answer = on_submit
+        self.time_up_handler = on_timeout  # Store the timeout handler for use in on_time_up
+        self.question_view.show(question, options, question_index, total_questions)
 
-        frame = tk.Frame(self.main_content, bg="white", padx=30, pady=30, bd=2, relief="ridge")
-        frame.pack(expand=True, fill="both", padx=20, pady=20)
+        self.start_timer(time_limit or self.question_time_limit)
 
-        progress = int((question_index + 1) / total_questions * 100)
-        ttk.Progressbar(frame, value=progress, maximum=100, length=300).pack(pady=(0, 20))
 
-        tk.Label(frame, text=f"Question {question_index + 1} of {total_questions}",
-                 font=("Segoe UI", 14, "italic"), bg="white", anchor="w").pack(fill="x")
+# ================== QUESTION VIEW ==================
+# Persistent widgets for the quiz screen. Created once when a quiz starts;
+# each question only updates texts, values and the progress bar, so moving
+# to the next question creates no widgets and no new Tcl objects.
+class QuestionView:
+    def __init__(self, master, on_submit):
+        self.frame = tk.Frame(master, bg="white", padx=30, pady=30, bd=2, relief="ridge")
+        self.frame.pack(expand=True, fill="both", padx=20, pady=20)
 
-        tk.Label(frame, text=question, font=("Segoe UI", 18, "bold"), wraplength=900,
-                 bg="white", justify="left").pack(anchor="w", pady=(20, 10))
+        self.progress = ttk.Progressbar(self.frame, value=0, maximum=100, length=300)
+        self.progress.pack(pady=(0, 20))
+
+        self.counter_label = tk.Label(self.frame, text="", font=("Segoe UI", 14, "italic"), bg="white", anchor="w")
+        self.counter_label.pack(fill="x")
+
+        self.question_label = tk.Label(self.frame, text="", font=("Segoe UI", 18, "bold"), wraplength=900,
+                                       bg="white", justify="left")
+        self.question_label.pack(anchor="w", pady=(20, 10))
 
         self.selected = tk.StringVar(value="")
 
-        for opt in options:
-            ttk.Radiobutton(frame, text=opt, variable=self.selected, value=opt,
-                            style="Cool.TRadiobutton").pack(anchor="w", pady=6)
+        # Radio buttons live in their own frame so extra ones can be shown/hidden in place
+        self.options_frame = tk.Frame(self.frame, bg="white")
+        self.options_frame.pack(anchor="w", fill="x")
+        self.option_buttons = []
 
-        self.timer_label = tk.Label(frame, text="Time: 20", font=("Segoe UI", 14), fg="red", bg="white")
+        self.timer_label = tk.Label(self.frame, text="", font=("Segoe UI", 14), fg="red", bg="white")
         self.timer_label.pack(pady=15)
 
-        self.submit_btn = tk.Button(frame, text="Submit", font=("Segoe UI", 14, "bold"),
+        self.submit_btn = tk.Button(self.frame, text="Submit", font=("Segoe UI", 14, "bold"),
                                     bg="#28a745", fg="white", activebackground="#218838",
-                                    activeforeground="white", width=12,
-                                    command=lambda: self.submit_wrapper(on_submit))
+                                    activeforeground="white", width=12, command=on_submit)
         self.submit_btn.pack(pady=10)
 
-        self.start_timer(20)
-
-        self.time_up_handler = on_timeout  # Store the timeout handler for use in update_timer
+    def exists(self):
+        try:
+            return bool(self.frame.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def show(self, question, options, question_index, total_questions):
+        self.progress.configure(value=int((question_index + 1) / total_questions * 100))
+        self.counter_label.configure(text=f"Question {question_index + 1} of {total_questions}")
+        self.question_label.configure(text=question)
+        self.selected.set("")
+
+        # Grow the button pool only if a question has more options than any before it
+        while len(self.option_buttons) < len(options):
+            self.option_buttons.append(ttk.Radiobutton(self.options_frame, variable=self.selected,
+                                                       style="Cool.TRadiobutton"))
+        for i, btn in enumerate(self.option_buttons):
+            if i < len(options):
+                btn.configure(text=options[i], value=options[i])
+                if not btn.winfo_ismapped():
+                    btn.pack(anchor="w", pady=6)
+            else:
+                btn.pack_forget()
+
+        self.submit_btn.configure(state="normal")
+
+
+# ================== PROGRESS GRAPH ==================
+# Embedded matplotlib Figure that is not registered with pyplot, so it is
+# freed with the UI instead of living until process exit. Results are kept
+# in chronological order and update() appends only attempts newer than the
+# last one seen. Long histories are drawn from at most max_points points
+# (LTTB downsampling), and the reveal animation has a fixed duration no
+# matter how many attempts there are.
+class ProgressGraph:
+    def __init__(self, max_points=400):
+        from matplotlib.figure import Figure
+        from matplotlib.ticker import MaxNLocator
+
+        self.max_points = max_points
+        self.correct = []
+        self.total = []
+        self.max_total = 0      # running max of total, for the y limit
+        self.max_id = None      # highest stored row id plotted
+        self._unsaved = set()   # (total, correct, created_at) of plotted rows not yet stored (id None)
+        self.canvas = None
+        self._root = None
+        self._reveal_id = None
+
+        self.figure = Figure(figsize=(7, 5))
+        self.ax = self.figure.add_subplot()
+        self.correct_line, = self.ax.plot([], [], 'g-o', label="Correct", markersize=4)
+        self.total_line, = self.ax.plot([], [], 'r--x', label="Total", markersize=4)
+        self.ax.xaxis.set_major_locator(MaxNLocator(nbins=10, integer=True))
+        self.ax.set_title("User Quiz Progress")
+        self.ax.set_xlabel("Attempts")
+        self.ax.set_ylabel("Questions")
+        self.ax.legend()
+        self._xs = []
+        self._ys_correct = []
+        self._ys_total = []
+
+    def update(self, results):
+        # results: (total_questions, correct_answers, created_at, id) rows, newest first. New rows
+        # are found by id, not created_at: a late row may carry an older created_at
+        new_rows = []
+        max_id = self.max_id
+        for row in results:
+            if row[3] is None:
+                if row[:3] not in self._unsaved:
+                    self._unsaved.add(row[:3])
+                    new_rows.append(row)
+                continue
+            if self.max_id is None or row[3] > self.max_id:
+                if row[:3] in self._unsaved:
+                    self._unsaved.discard(row[:3])  # already plotted before it was stored
+                else:
+                    new_rows.append(row)
+            if max_id is None or row[3] > max_id:
+                max_id = row[3]
+        self.max_id = max_id
+        if not new_rows:
+            return 0
+        for total, correct, _, _ in reversed(new_rows):
+            self.total.append(total)
+            self.correct.append(correct)
+            self.max_total = max(self.max_total, total)
+        self._resample()
+        return len(new_rows)
+
+    def _resample(self):
+        # A full LTTB pass on purpose: bucket boundaries are a function of the
+        # series length, so every appended attempt moves all of them and a
+        # tail-only pass would keep points picked for the old buckets. It runs
+        # only when update() found new rows (about once per finished quiz) and
+        # is linear in the history, with at most max_points kept
+        from utils.downsample import lttb_indices
+        n = len(self.correct)
+        indices = lttb_indices(self.correct, self.max_points)
+        self._xs = [i + 1 for i in indices]
+        self._ys_correct = [self.correct[i] for i in indices]
+        self._ys_total = [self.total[i] for i in indices]
+        self.ax.set_xlim(0.5, max(n, 1) + 0.5)
+        self.ax.set_ylim(0, max(self.max_total, 1) + 1)
+
+    def attach(self, master):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.detach()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        return self.canvas.get_tk_widget()
+
+    def detach(self):
+        # Called from QuizUI.clear(): drop the Tk canvas and its render buffer, keep the data
+        if self._reveal_id is not None:
+            try:
+                self._root.after_cancel(self._reveal_id)
+            except tk.TclError:
+                pass
+        self._reveal_id = None
+        if self.canvas is not None:
+            try:
+                self.canvas.get_tk_widget().destroy()
+            except tk.TclError:
+                pass
+            self.canvas = None
+
+    def reveal(self, root, duration_ms=1200, steps=24):
+        self._root = root
+        count = len(self._xs)
+        steps = max(1, min(steps, count))
+        interval = duration_ms // steps
+
+        def step(i=1):
+            self._reveal_id = None
+            if self.canvas is None:
+                return
+            upto = count if i >= steps else max(1, count * i // steps)
+            self.correct_line.set_data(self._xs[:upto], self._ys_correct[:upto])
+            self.total_line.set_data(self._xs[:upto], self._ys_total[:upto])
+            self.canvas.draw_idle()
+            if upto < count:
+                self._reveal_id = root.after(interval, lambda: step(i + 1))
+        step()
@@ -0,0 +1,269 @@
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+from utils import db
+
+# Exportable tables: columns with their Parquet types, the integer key used
+# to split the table into parts (None: exported as one part, or one part per
+# calendar month of the time column when "split" is "month") and the
+# timestamp column --since/--until filter on (None: always exported whole).
+# users and password_resets are left out on purpose (credentials, emails).
+TABLES = {
+    "quiz_results": {
+        "columns": [("id", "int64"), ("username", "string"), ("total_questions", "int32"),
+                    ("correct_answers", "int32"), ("created_at", "timestamp"), ("event_id", "string")],
+        "key": "id", "time": "created_at",
+    },
+    "feedback": {
+        "columns": [("username", "string"), ("rating", "int32"), ("liked", "bool"), ("feedback_note", "string")],
+        "key": None, "time": None,
+    },
+    "comments": {
+        "columns": [("id", "int64"), ("username", "string"), ("comment", "string"), ("event_id", "string")],
+        "key": "id", "time": None,
+    },
+    "reports": {
+        "columns": [("id", "int64"), ("username", "string"), ("report", "string"),
+                    ("created_at", "timestamp"), ("event_id", "string")],
+        "key": "id", "time": "created_at",
+    },
+    # No integer key; months match the table's partitions (see migrations.ensure_answer_partitions)
+    "answer_events": {
+        "columns": [("answered_at", "timestamp"), ("session_id", "string"), ("question_id", "int64"),
+                    ("latency_ms", "int32"), ("position", "int32"), ("chosen", "int32"), ("correct", "bool"),
+                    ("timed_out", "bool")],
+        "key": None, "time": "answered_at", "split": "month",
+    },
+}
+
+
+# ================== BULK EXPORT ==================
+# Copies whole tables (or a created_at range of them) into
+# <out_dir>/<table>/part-NNNNN.csv.gz or .parquet. Keyed tables are cut into
+# parts of `chunk_rows` ids. Each part is one COPY ... TO STDOUT, streamed
+# by the server straight into the output file. A pool of workers, each
+# with its own connection, runs parts from every table in parallel. Rows
+# never become Python objects on the CSV path. The Parquet path converts
+# one part at a time with pyarrow's streaming CSV reader.
+#
+# <out_dir>/manifest.json records the options, each table's key bounds and
+# every finished part. Parts are written under a temporary name and renamed
+# when complete, so an interrupted run resumes where it stopped when
+# started again with the same options.
+class ExportError(Exception):
+    pass
+
+
+class BulkExporter:
+    def __init__(self, out_dir, tables=None, since=None, until=None, fmt="csv", workers=4,
+                 chunk_rows=1_000_000, compresslevel=6):
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ExportError("Parquet output needs pyarrow: pip install pyarrow")
+        unknown = set(tables or ()) - set(TABLES)
+        if unknown:
+            raise ExportError("Unknown table(s): " + ", ".join(sorted(unknown)))
+        self.out_dir = out_dir
+        self.tables = list(tables or TABLES)
+        self.since = since
+        self.until = until
+        self.fmt = fmt
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.compresslevel = compresslevel
+        self.manifest_path = os.path.join(out_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+    # ---------- Checkpoints ----------
+    def _options(self):
+        return {"since": self.since, "until": self.until, "format": self.fmt, "chunk_rows": self.chunk_rows}
+
+    def _load_manifest(self, restart):
+        if restart or not os.path.exists(self.manifest_path):
+            return {"options": self._options(), "tables": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["options"] != self._options():
+            raise ExportError(f"{self.out_dir} holds an export made with different options "
+                              f"{manifest['options']}; use --restart or another directory")
+        return manifest
+
+    def _save_manifest(self):
+        # Caller holds self._lock
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    # ---------- Planning ----------
+    def _where(self, cur, spec, lo=None, hi=None):
+        clauses, params = [], []
+        if lo is not None:
+            column = spec["key"] or spec["time"]
+            clauses.append(f"{column} >= %s AND {column} < %s")
+            params += [lo, hi]
+        if spec["time"] and self.since:
+            clauses.append(f"{spec['time']} >= %s")
+            params.append(self.since)
+        if spec["time"] and self.until:
+            clauses.append(f"{spec['time']} < %s")
+            params.append(self.until)
+        if not clauses:
+            return ""
+        return cur.mogrify(" WHERE " + " AND ".join(clauses), params).decode()
+
+    def _plan(self, table):
+        # Key bounds are fixed on the first run and reused on resume, so parts always cover the same ids
+        spec = TABLES[table]
+        entry = self.manifest["tables"].get(table)
+        if entry is None:
+            bounds = None
+            column = spec["key"] or (spec["time"] if spec.get("split") == "month" else None)
+            if column:
+                with db.cursor() as cur:
+                    cur.execute(f"SELECT min({column}), max({column}) FROM {table}" + self._where(cur, spec))
+                    lo, hi = cur.fetchone()
+                if lo is not None and not spec["key"]:
+                    lo, hi = lo.date().isoformat(), hi.date().isoformat()
+                bounds = [lo, hi] if lo is not None else []
+            entry = self.manifest["tables"][table] = {"bounds": bounds, "parts": {}}
+        if entry["bounds"] is None:
+            return [(table, 0, None, None)]
+        if not entry["bounds"]:
+            return []
+        lo, hi = entry["bounds"]
+        if not spec["key"]:
+            return [(table, n, start.isoformat(), end.isoformat())
+                    for n, (start, end) in enumerate(_months(date.fromisoformat(lo), date.fromisoformat(hi)))]
+        return [(table, n, start, min(start + self.chunk_rows, hi + 1))
+                for n, start in enumerate(range(lo, hi + 1, self.chunk_rows))]
+
+    # ---------- Workers ----------
+    def _export_part(self, table, number, lo, hi):
+        spec = TABLES[table]
+        columns = ", ".join(name for name, _ in spec["columns"])
+        ext = "csv.gz" if self.fmt == "csv" else "parquet"
+        path = os.path.join(self.out_dir, table, f"part-{number:05d}.{ext}")
+        tmp = path + ".tmp"
+        with db.cursor() as cur:
+            order = f" ORDER BY {spec['key'] or spec['columns'][0][0]}"
+            copy = f"COPY (SELECT {columns} FROM {table}{self._where(cur, spec, lo, hi)}{order}) " \
+                   "TO STDOUT WITH (FORMAT csv, HEADER)"
+            if self.fmt == "csv":
+                with gzip.open(tmp, "wb", compresslevel=self.compresslevel) as f:
+                    cur.copy_expert(copy, f, size=1 << 20)
+            else:
+                with open(tmp + ".csv", "wb") as f:
+                    cur.copy_expert(copy, f, size=1 << 20)
+            rows = cur.rowcount
+        if self.fmt == "parquet":
+            try:
+                _csv_to_parquet(tmp + ".csv", tmp, spec["columns"])
+            finally:
+                os.remove(tmp + ".csv")
+        os.replace(tmp, path)
+        return table, number, path, rows
+
+    def run(self, restart=False):
+        # Returns {table: rows exported in this run}
+        self.manifest = self._load_manifest(restart)
+        parts = []
+        for table in self.tables:
+            os.makedirs(os.path.join(self.out_dir, table), exist_ok=True)
+            planned = self._plan(table)
+            done = self.manifest["tables"][table]["parts"]
+            # A recorded part whose file was deleted or moved away is exported again
+            for number, part in list(done.items()):
+                if not os.path.exists(os.path.join(self.out_dir, part["file"])):
+                    print(f"{table} part {number}: {part['file']} is missing, exporting it again")
+                    del done[number]
+            parts += [p for p in planned if str(p[1]) not in done]
+        with self._lock:
+            self._save_manifest()
+
+        exported = {table: 0 for table in self.tables}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-export") as pool:
+            futures = [pool.submit(self._export_part, *part) for part in parts]
+            for future in as_completed(futures):
+                table, number, path, rows = future.result()
+                with self._lock:
+                    self.manifest["tables"][table]["parts"][str(number)] = {
+                        "file": os.path.relpath(path, self.out_dir), "rows": rows}
+                    self._save_manifest()
+                exported[table] += rows
+                print(f"{table} part {number}: {rows} rows")
+        return exported
+
+
+def _months(first, last):
+    # (start, end) of every calendar month from the one holding `first` to the one holding `last`
+    start = first.replace(day=1)
+    while start <= last:
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        yield start, end
+        start = end
+
+
+def _csv_to_parquet(csv_path, parquet_path, columns):
+    # Streams record batches from the CSV into the Parquet file; memory is bounded by the block size
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    import pyarrow.parquet as pq
+
+    types = {"int32": pa.int32(), "int64": pa.int64(), "string": pa.string(), "bool": pa.bool_(),
+             "timestamp": pa.timestamp("us")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=16 << 20),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=schema, true_values=["t"], false_values=["f"],
+            strings_can_be_null=True, quoted_strings_can_be_null=False),
+    )
+    with pq.ParquetWriter(parquet_path, schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+# ================== CLI ==================
+# python -m utils.bulk_export OUT_DIR [--tables quiz_results reports] [--since 2024-01-01]
+#        [--until 2024-02-01] [--format csv|parquet] [--workers 4] [--chunk-rows 1000000] [--restart]
+# Connects with the DB_HOST / DB_NAME / DB_USER / DB_PASS / DB_PORT environment variables.
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Export QuizMaster tables with COPY")
+    parser.add_argument("out_dir")
+    parser.add_argument("--tables", nargs="+", choices=sorted(TABLES), help="default: all")
+    parser.add_argument("--since", help="only rows with created_at (answered_at) >= this, in tables that have it")
+    parser.add_argument("--until", help="only rows with created_at (answered_at) < this")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="ids per part file")
+    parser.add_argument("--compresslevel", type=int, default=6, help="gzip level for CSV parts")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing manifest and start over")
+    args = parser.parse_args()
+
+    db.init_pool(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                 password=os.getenv("DB_PASS"), port=os.getenv("DB_PORT", 5432), maxconn=args.workers + 1)
+    try:
+        exporter = BulkExporter(args.out_dir, args.tables, args.since, args.until, args.format,
+                                args.workers, args.chunk_rows, args.compresslevel)
+        start = time.perf_counter()
+        exported = exporter.run(restart=args.restart)
+    except ExportError as e:
+        sys.exit(str(e))
+    finally:
+        db.close_pool()
+    elapsed = time.perf_counter() - start
+    total = sum(exported.values())
+    print(f"Exported {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s): "
+          + ", ".join(f"{t}={n}" for t, n in exported.items()))
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+CACHE_FILE = os.path.join(os.path.dirname(__file__), "../data/config_cache.bin")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+
+class ConfigFetchError(Exception):
+    pass
+
+
+# ================== REMOTE .ENV FETCH ==================
+def parse_env(text):
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def fetch_env_from_github(token, repo, env_path, etag=None, api_url=None, timeout=10):
+    # Returns (values, etag); values is None when GitHub answers 304 Not Modified,
+    # which does not count against the API rate limit
+    import requests
+    url = f"{(api_url or GITHUB_API_URL).rstrip('/')}/repos/{repo}/contents/{env_path}"
+    headers = {"Authorization": f"token {token}"}
+    if etag:
+        headers["If-None-Match"] = etag
+    try:
+        resp = requests.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        raise ConfigFetchError(f"Could not reach {url}: {e}")
+    if resp.status_code == 304:
+        return None, etag
+    if resp.status_code != 200:
+        raise ConfigFetchError(f"Failed to fetch .env from GitHub: {resp.status_code} {resp.text}")
+    decoded = base64.b64decode(resp.json()["content"]).decode()
+    return parse_env(decoded), resp.headers.get("ETag")
+
+
+# ================== ENCRYPTED TTL CACHE ==================
+# Keeps the last fetched configuration on disk, encrypted with a key derived
+# from the local THING token (Fernet: AES-CBC + HMAC, with a signed
+# timestamp that doubles as the fetch time). Lookups follow
+# stale-while-revalidate:
+#   age < ttl               -> use cache, no network
+#   age < ttl + max_stale   -> use cache now, refresh in a background thread
+#   older / missing / bad   -> fetch synchronously, falling back to any
+#                              readable cache if the fetch fails
+# The TTL is jittered per process so a lab full of kiosks booting together
+# does not refresh in lockstep.
+class ConfigCache:
+    def __init__(self, secret, path=CACHE_FILE, ttl=3600, max_stale=7 * 24 * 3600, jitter=0.1):
+        from cryptography.fernet import Fernet
+        key = base64.urlsafe_b64encode(hashlib.sha256(b"quizmaster-config:" + secret.encode()).digest())
+        self._fernet = Fernet(key)
+        self.path = path
+        self.ttl = ttl * (1 + random.uniform(-jitter, jitter))
+        self.max_stale = max_stale
+        self._refresh_thread = None
+
+    def _read(self):
+        from cryptography.fernet import InvalidToken
+        try:
+            with open(self.path, "rb") as f:
+                token = f.read()
+            payload = json.loads(self._fernet.decrypt(token))
+            fetched_at = self._fernet.extract_timestamp(token)
+        except (OSError, ValueError, InvalidToken):
+            return None, None, None
+        return payload.get("values"), payload.get("etag"), fetched_at
+
+    def _write(self, values, etag):
+        token = self._fernet.encrypt(json.dumps({"values": values, "etag": etag}).encode())
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _refresh(self, fetch, cached_values, etag):
+        # fetch(etag) -> (values or None if unchanged, etag)
+        values, new_etag = fetch(etag)
+        if values is None:
+            values = cached_values
+        self._write(values, new_etag)
+        return values
+
+    def _refresh_in_background(self, fetch, cached_values, etag):
+        def run():
+            try:
+                self._refresh(fetch, cached_values, etag)
+            except Exception as e:
+                print("Background config refresh failed:", e)
+        self._refresh_thread = threading.Thread(target=run, name="config-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def get(self, fetch):
+        values, etag, fetched_at = self._read()
+        if values is not None:
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                return values
+            if age < self.ttl + self.max_stale:
+                self._refresh_in_background(fetch, values, etag)
+                return values
+        try:
+            return self._refresh(fetch, values, etag if values is not None else None)
+        except Exception as e:
+            if values is not None:
+                print("Config fetch failed, using expired cache:", e)
+                return values
+            raise
+
+    def wait_for_refresh(self, timeout=None):
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
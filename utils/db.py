@@ -0,0 +1,177 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+
+# ================== CONNECTION POOL ==================
+# Thread-safe pool of PostgreSQL connections. Every data helper borrows a
+# connection for one unit of work and hands it back, so a failed statement
+# only rolls back its own transaction and several threads can talk to the
+# database at the same time. Dead connections are detected by a cheap
+# health check and replaced without the caller noticing.
+class ConnectionPool:
+    def __init__(self, minconn=1, maxconn=8, health_check_interval=30.0, acquire_timeout=30.0, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.conn_kwargs = conn_kwargs
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_checked = {}  # id(conn) -> monotonic time of last successful check
+        self._stats_lock = threading.Lock()
+        self.stats = {"in_use": 0, "peak_in_use": 0, "acquired": 0, "replaced": 0}
+
+    @property
+    def closed(self):
+        return self._pool.closed
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - self._last_checked.get(id(conn), 0.0) < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        self._last_checked[id(conn)] = now
+        return True
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise psycopg2.OperationalError("Timed out waiting for a free database connection")
+        try:
+            # Every connection in the pool may have died (e.g. server restart), so allow one full sweep
+            for _ in range(self.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    with self._stats_lock:
+                        self.stats["in_use"] += 1
+                        self.stats["acquired"] += 1
+                        self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.stats["in_use"])
+                    return conn
+                with self._stats_lock:
+                    self.stats["replaced"] += 1
+                self._last_checked.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        try:
+            if close or conn.closed:
+                self._last_checked.pop(id(conn), None)
+                close = True
+            if self._pool.closed:
+                conn.close()
+            else:
+                self._pool.putconn(conn, close=close)
+        finally:
+            with self._stats_lock:
+                self.stats["in_use"] -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        # Commit on success, roll back on error, always return the connection
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def closeall(self):
+        if not self._pool.closed:
+            self._pool.closeall()
+        self._last_checked.clear()
+
+
+# ================== MODULE-LEVEL POOL ==================
+_pool = None
+
+
+def init_pool(host, database, user, password, port, minconn=1, maxconn=8):
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+    _pool = ConnectionPool(minconn=minconn, maxconn=maxconn, host=host, database=database,
+                           user=user, password=password, port=port)
+    return _pool
+
+
+def get_pool():
+    if _pool is None:
+        raise RuntimeError("Database pool has not been initialised; call init_pool() first")
+    return _pool
+
+
+def cursor():
+    return get_pool().cursor()
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+# ================== PREPARED STATEMENTS ==================
+# Hot queries are registered once by name (with $1, $2 ... placeholders).
+# Each pooled connection PREPAREs a statement the first time it runs it, so
+# the server parses and plans it once per session; every later call is a
+# single EXECUTE round trip that only ships the parameters. Prepared
+# statements survive rollbacks, and a replaced connection is a new object
+# here, so it simply prepares again.
+_statements = {}
+_prepared = weakref.WeakKeyDictionary()  # connection -> names prepared on it
+_prepared_lock = threading.Lock()
+
+
+def register_statement(name, sql):
+    _statements[name] = sql
+
+
+def _execute_sql(cur, name, params):
+    with _prepared_lock:
+        done = _prepared.setdefault(cur.connection, set())
+    if name not in done:
+        cur.execute(f"PREPARE {name} AS {_statements[name]}")
+        done.add(name)
+    return f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+
+
+def execute_prepared(cur, name, params=()):
+    cur.execute(_execute_sql(cur, name, params), params or None)
+
+
+def explain_prepared(cur, name, params=()):
+    # The JSON plan of exactly the statement execute_prepared runs
+    cur.execute("EXPLAIN (FORMAT JSON) " + _execute_sql(cur, name, params), params or None)
+    return cur.fetchone()[0]
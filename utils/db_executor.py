@@ -0,0 +1,116 @@
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ================== BACKGROUND DB EXECUTOR ==================
+# Runs blocking database calls on worker threads so the Tk mainloop keeps
+# painting and the question timer keeps ticking. Tk is not thread-safe, so
+# workers never touch widgets: finished futures are queued and the Tk thread
+# drains that queue from a root.after poll, running callbacks on itself.
+class DBExecutor:
+    def __init__(self, root, max_workers=4, poll_interval=25):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._completed = queue.Queue()
+        self._pending = 0
+        self._busy_count = 0
+        self._busy_label = None
+        self._poll_id = None
+        self._closed = False
+        self._gate = None
+
+    def set_gate(self, future):
+        # Jobs submitted from now on wait for `future` (e.g. background startup)
+        # on their worker thread and fail with its exception if it failed
+        self._gate = future
+
+    def submit(self, fn, *args, on_success=None, on_error=None, busy=True, **kwargs):
+        # Returns a concurrent.futures.Future; callbacks always run on the Tk thread
+        if self._gate is not None:
+            future = self._executor.submit(self._run_gated, self._gate, fn, args, kwargs)
+        else:
+            future = self._executor.submit(fn, *args, **kwargs)
+        return self.watch(future, on_success, on_error, busy)
+
+    def watch(self, future, on_success=None, on_error=None, busy=True):
+        # Deliver the outcome of a future produced elsewhere (e.g. the mail
+        # dispatcher) to callbacks on the Tk thread
+        if busy:
+            self._set_busy(1)
+        self._pending += 1
+        future.add_done_callback(lambda f: self._completed.put((f, on_success, on_error, busy)))
+        self._schedule_poll()
+        return future
+
+    @staticmethod
+    def _run_gated(gate, fn, args, kwargs):
+        gate.result()
+        return fn(*args, **kwargs)
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    future, on_success, on_error, busy = self._completed.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending -= 1
+                if busy:
+                    self._set_busy(-1)
+                self._dispatch(future, on_success, on_error)
+        finally:
+            # Completions queued behind a failing callback are still delivered
+            if self._pending > 0:
+                self._schedule_poll()
+
+    def _dispatch(self, future, on_success, on_error):
+        try:
+            exc = future.exception()
+            if exc is not None:
+                if on_error:
+                    on_error(exc)
+                else:
+                    print("Database error:", exc)
+            elif on_success:
+                on_success(future.result())
+        except tk.TclError as e:
+            # The widget the callback targeted was destroyed while the query ran
+            print("Callback skipped:", e)
+        except Exception as e:
+            # A bug in one callback must not strand the others or the busy indicator
+            print(f"Callback failed: {type(e).__name__}: {e}")
+
+    # ---------- Busy indicator ----------
+    def _set_busy(self, delta):
+        self._busy_count = max(0, self._busy_count + delta)
+        try:
+            if self._busy_count:
+                self.root.config(cursor="watch")
+                if self._busy_label is None or not self._busy_label.winfo_exists():
+                    self._busy_label = tk.Label(self.root, text="⏳ Working…", font=("Segoe UI", 10),
+                                                bg="#ffc107", fg="#212529", padx=10, pady=3)
+                self._busy_label.place(relx=0.5, rely=1.0, y=-10, anchor="s")
+                self._busy_label.lift()
+            else:
+                self.root.config(cursor="")
+                if self._busy_label is not None and self._busy_label.winfo_exists():
+                    self._busy_label.place_forget()
+        except tk.TclError:
+            pass
+
+    def shutdown(self, wait=True):
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=wait)
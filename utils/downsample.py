@@ -0,0 +1,37 @@
+# ================== SERIES DOWNSAMPLING ==================
+# Largest-Triangle-Three-Buckets: keeps the first and last point and, for
+# every bucket in between, the point forming the largest triangle with the
+# previously kept point and the average of the next bucket. Preserves the
+# visual shape (peaks and dips) of a long history with a fixed point budget.
+def lttb_indices(ys, threshold, xs=None):
+    n = len(ys)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    if xs is None:
+        xs = range(n)
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[j] for j in range(next_start, next_end)) / span
+        avg_y = sum(ys[j] for j in range(next_start, next_end)) / span
+
+        # Pick the point in this bucket with the largest triangle area
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+    indices.append(n - 1)
+    return indices
+
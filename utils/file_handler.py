@@ -1,21 +1,31 @@
-import json
-import csv
 import os
+import threading
+
+from utils.result_log import ResultLogger, iter_results
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "../data/questions.json")
 USER_TRACK = os.path.join(os.path.dirname(__file__), "../user_track.csv")
 
 def load_questions():
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
+    # Served from the shared in-memory bank; the file is only re-read when it changes
+    from utils.question_bank import get_question_bank
+    return get_question_bank().all()
+
+# Results are buffered and appended in batches; user_track.csv rotates at
+# 10 MB into gzipped user_track.<timestamp>.csv.gz segments (newest 30 kept)
+_result_logger = None
+_result_logger_lock = threading.Lock()
+
+def get_result_logger():
+    global _result_logger
+    with _result_logger_lock:
+        if _result_logger is None:
+            _result_logger = ResultLogger(USER_TRACK)
+        return _result_logger
 
 def save_user_result(username, total, score):
-    header = ["Username", "Total Questions", "Correct Answers"]
-    row = [username, total, score]
-    file_exists = os.path.exists(USER_TRACK)
+    get_result_logger().log(username, total, score)
 
-    with open(USER_TRACK, mode="a", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(header)
-        writer.writerow(row)
\ No newline at end of file
+def load_user_results():
+    # Streams (username, total, score) rows across all segments, oldest first
+    return iter_results(USER_TRACK)
@@ -0,0 +1,202 @@
+import json
+import os
+import struct
+import threading
+import zlib
+
+_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+
+
+# ================== APPEND-ONLY KEY/VALUE LOG ==================
+# Every put/delete appends one framed record ([key, value] as JSON, value
+# None for a delete) to the end of the log; nothing is ever rewritten in
+# place. Opening the store replays the log once into an in-memory dict, so
+# lookups are O(1) dict hits and writes are O(1) appends however many keys
+# there are. A crash can only leave a torn last record, which fails its
+# length/CRC check and is cut off on the next open.
+#
+# Overwritten and deleted records stay in the file as garbage until
+# compaction writes the live entries to a temporary file and atomically
+# renames it over the log. That happens automatically once garbage
+# outweighs live data (and there is at least `compact_min` of it).
+# One process owns a log at a time; threads may share the store.
+class LogStore:
+    def __init__(self, path, fsync=True, compact_ratio=1.0, compact_min=1000):
+        self.path = path
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self._lock = threading.Lock()
+        self._index = {}
+        self._garbage = 0  # records in the file that no longer hold a live value
+        self._load()
+        self._file = open(self.path, "ab")
+
+    # ---------- Opening ----------
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, pos)
+            payload = data[pos + _HEADER.size:pos + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            key, value = json.loads(payload)
+            self._apply(key, value)
+            pos += _HEADER.size + length
+        if pos < len(data):
+            print(f"{self.path}: dropping {len(data) - pos} byte(s) of incomplete records")
+            with open(self.path, "r+b") as f:
+                f.truncate(pos)
+
+    def _apply(self, key, value):
+        if key in self._index:
+            self._garbage += 1  # the record holding the old value is dead
+        if value is None:
+            self._index.pop(key, None)
+            self._garbage += 1  # and so is the tombstone
+        else:
+            self._index[key] = value
+
+    # ---------- Reads ----------
+    def get(self, key, default=None):
+        return self._index.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def items(self):
+        with self._lock:
+            return list(self._index.items())
+
+    # ---------- Writes ----------
+    @staticmethod
+    def _frame(key, value):
+        payload = json.dumps([key, value], separators=(",", ":")).encode("utf-8")
+        return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _append(self, key, value):
+        # Caller holds self._lock
+        self._file.write(self._frame(key, value))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._apply(key, value)
+        if self._garbage >= self.compact_min and self._garbage > len(self._index) * self.compact_ratio:
+            self._compact()
+
+    def put(self, key, value):
+        if value is None:
+            raise ValueError("None is reserved for deletes")
+        with self._lock:
+            self._append(key, value)
+
+    def put_if_absent(self, key, value):
+        # Returns False (and writes nothing) when the key already exists
+        with self._lock:
+            if key in self._index:
+                return False
+            self._append(key, value)
+            return True
+
+    def put_if_equal(self, key, value, expected):
+        # Returns False (and writes nothing) when the current value is not expected
+        if value is None:
+            raise ValueError("None is reserved for deletes")
+        with self._lock:
+            if self._index.get(key) != expected:
+                return False
+            self._append(key, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._index:
+                self._append(key, None)
+
+    # ---------- Compaction ----------
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "wb") as f:
+            f.writelines(self._frame(k, v) for k, v in self._index.items())
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._fsync_dir()
+        self._file = open(self.path, "ab")
+        self._garbage = 0
+
+    def _fsync_dir(self):
+        # Make the rename itself durable (not possible on Windows, where replace is already atomic)
+        if os.name == "nt":
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ================== BENCHMARK ==================
+# python -m utils.log_store [users]
+# Registration and lookup cost with the log versus rewriting a JSON file.
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import time
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    value = "scrypt$16384$8$1$" + "A" * 22 + "$" + "B" * 43
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, "users.log"), fsync=False)
+        start = time.perf_counter()
+        for i in range(users):
+            store.put_if_absent(f"user{i}", value)
+        put = (time.perf_counter() - start) / users
+        start = time.perf_counter()
+        for i in range(users):
+            store.get(f"user{i}")
+        get = (time.perf_counter() - start) / users
+        store.close()
+
+        start = time.perf_counter()
+        store = LogStore(os.path.join(tmp, "users.log"))
+        reopen = time.perf_counter() - start
+        start = time.perf_counter()
+        store.put("user0", value)
+        durable_put = time.perf_counter() - start
+        store.close()
+
+        # The old user_auth.py: parse everything, add one user, rewrite everything
+        json_path = os.path.join(tmp, "users.json")
+        with open(json_path, "w") as f:
+            json.dump({f"user{i}": value for i in range(users)}, f)
+        start = time.perf_counter()
+        for i in range(20):
+            with open(json_path) as f:
+                data = json.load(f)
+            data[f"new{i}"] = value
+            with open(json_path, "w") as f:
+                json.dump(data, f)
+        json_put = (time.perf_counter() - start) / 20
+
+    print(f"{users} users")
+    print(f"log append:       {put * 1e6:10.1f} us (no fsync), {durable_put * 1e6:.1f} us with fsync")
+    print(f"log lookup:       {get * 1e6:10.2f} us")
+    print(f"log reopen:       {reopen * 1e3:10.1f} ms")
+    print(f"JSON rewrite add: {json_put * 1e6:10.1f} us")
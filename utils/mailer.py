@@ -0,0 +1,194 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") != "0"
+
+_STOP = object()
+
+
+# ================== BACKGROUND MAIL DISPATCHER ==================
+# A single worker thread owns one authenticated SMTP session and keeps it
+# open between messages, so a burst of password resets costs one TLS
+# handshake + login instead of one per message. Messages queued while the
+# worker is busy are sent back-to-back over the same session. Failures are
+# retried with exponential backoff (reconnecting if the server dropped us),
+# and every send() returns a Future that resolves once delivery succeeded
+# or finally failed.
+class MailDispatcher:
+    def __init__(self, username=None, password=None, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_SSL,
+                 batch_size=50, idle_timeout=120.0, noop_after=30.0, max_retries=3, backoff=1.0, timeout=20):
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {"sent": 0, "failed": 0, "connections": 0, "retries": 0}
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._last_used = 0.0
+        self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+        self._thread.start()
+
+    def send(self, msg):
+        future = Future()
+        self._queue.put((msg, future))
+        return future
+
+    def close(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ---------- Session handling ----------
+    def _connect(self):
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self.stats["connections"] += 1
+        return smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+    def _session(self):
+        # Reuse the open session; probe it with NOOP if it has sat idle for a while
+        if self._smtp is not None and time.monotonic() - self._last_used > self.noop_after:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._disconnect()
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    # ---------- Worker ----------
+    def _deliver(self, msg):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._session().send_message(msg)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+                # Connection-level failure: drop the session and try a fresh one
+                self._smtp = None
+                if attempt == self.max_retries:
+                    raise
+            except smtplib.SMTPRecipientsRefused:
+                raise  # retrying will not help
+            except smtplib.SMTPException:
+                self._disconnect()
+                if attempt == self.max_retries:
+                    raise
+            self.stats["retries"] += 1
+            time.sleep(delay)
+            delay *= 2
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()  # nothing to send for a while; don't hold the session open
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for i, entry in enumerate(batch):
+                if entry is _STOP:
+                    self._disconnect()
+                    self._fail_remaining(batch[i + 1:])
+                    return
+                msg, future = entry
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._deliver(msg)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    future.set_exception(e)
+                else:
+                    self.stats["sent"] += 1
+                    future.set_result(True)
+
+    def _fail_remaining(self, entries):
+        # Nobody will deliver these any more; don't leave their senders waiting
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for entry in entries:
+            if entry is not _STOP and entry[1].set_running_or_notify_cancel():
+                entry[1].set_exception(RuntimeError("mailer stopped"))
+
+
+# ================== THROUGHPUT BENCHMARK ==================
+# python -m utils.mailer [count]
+# Starts a local aiosmtpd server and compares one-connection-per-message
+# (the old send_otp_email behaviour) with the dispatcher.
+if __name__ == "__main__":
+    import socket
+    import sys
+    from email.message import EmailMessage
+    from aiosmtpd.controller import Controller
+
+    class _Sink:
+        async def handle_DATA(self, server, session, envelope):
+            return "250 OK"
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        host, port = probe.getsockname()
+    controller = Controller(_Sink(), hostname=host, port=port)
+    controller.start()
+
+    def make_msg(i):
+        msg = EmailMessage()
+        msg.set_content(f"Your OTP is {100000 + i}")
+        msg["Subject"] = "QuizMaster Password Reset OTP"
+        msg["From"] = "quizmaster@example.com"
+        msg["To"] = f"user{i}@example.com"
+        return msg
+
+    start = time.perf_counter()
+    for i in range(count):
+        with smtplib.SMTP(host, port) as smtp:
+            smtp.send_message(make_msg(i))
+    per_message = time.perf_counter() - start
+
+    dispatcher = MailDispatcher(host=host, port=port, use_ssl=False)
+    start = time.perf_counter()
+    futures = [dispatcher.send(make_msg(i)) for i in range(count)]
+    for f in futures:
+        f.result()
+    pooled = time.perf_counter() - start
+    dispatcher.close()
+    controller.stop()
+
+    print(f"connection per message: {count / per_message:8.1f} msg/s")
+    print(f"dispatcher            : {count / pooled:8.1f} msg/s ({dispatcher.stats['connections']} connection(s))")
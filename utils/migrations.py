@@ -0,0 +1,354 @@
+import json
+import re
+from datetime import date
+
+import psycopg2
+from psycopg2 import errors
+
+from utils import db
+
+# ================== SCHEMA MIGRATIONS ==================
+# Each migration is (version, description, statements, transactional).
+# Startup costs a single `SELECT max(version)` round trip once the schema
+# is current; pending migrations run in order under an advisory lock, so
+# many kiosks starting at once do not race each other. Non-transactional
+# migrations run in autocommit mode, which CREATE INDEX CONCURRENTLY needs
+# to build indexes on a live table without blocking writes. A concurrent
+# build that fails leaves an INVALID index behind, which IF NOT EXISTS would
+# then skip, so such leftovers are dropped before the build and the version
+# is only recorded once every index it creates is valid.
+MIGRATIONS = [
+    (1, "baseline tables", [
+        """CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS quiz_results (
+            id SERIAL PRIMARY KEY,
+            username TEXT NOT NULL,
+            total_questions INTEGER NOT NULL,
+            correct_answers INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS feedback (
+            username TEXT PRIMARY KEY,
+            rating INTEGER,
+            liked BOOLEAN,
+            feedback_note TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS comments (
+            id SERIAL PRIMARY KEY,
+            username TEXT,
+            comment TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS reports (
+            id SERIAL PRIMARY KEY,
+            username TEXT,
+            report TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS password_resets (
+            id SERIAL PRIMARY KEY,
+            username TEXT,
+            email TEXT,
+            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ], True),
+    (2, "indexes for hot queries", [
+        # fetch_user_results_pg: filter by user, newest first
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS quiz_results_username_created_at_idx "
+        "ON quiz_results (username, created_at DESC)",
+        # fetch_user_results_after_pg: incremental reads resume after the last id seen (ids are
+        # assigned by the server on insert, unlike created_at, which comes from the kiosk clock)
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS quiz_results_username_id_idx ON quiz_results (username, id)",
+        # reset_password_flow looks users up by email
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_idx ON users (email)",
+        # prune_password_resets deletes by age
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS password_resets_requested_at_idx "
+        "ON password_resets (requested_at)",
+    ], False),
+    (3, "event ids for idempotent write-behind inserts", [
+        "ALTER TABLE quiz_results ADD COLUMN IF NOT EXISTS event_id UUID",
+        "ALTER TABLE comments ADD COLUMN IF NOT EXISTS event_id UUID",
+        "ALTER TABLE reports ADD COLUMN IF NOT EXISTS event_id UUID",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS quiz_results_event_id_key ON quiz_results (event_id)",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS comments_event_id_key ON comments (event_id)",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS reports_event_id_key ON reports (event_id)",
+    ], False),
+    # One row per answered question, spooled with the session's result and
+    # inserted in batches by the write-behind buffer (one COPY per session when
+    # it is disabled). Columns are ordered widest first so the tuple has no
+    # alignment padding (~72 bytes with header). The user is not repeated per
+    # answer: session_id is the quiz_results event_id. Monthly range
+    # partitions keep each month's heap and index small, let time-bounded
+    # aggregates prune whole months, and let old months be detached or
+    # dropped instead of deleted row by row; see ensure_answer_partitions(). Per-question aggregates are answered
+    # from the covering index alone (index-only scans; closed months stay
+    # all-visible once vacuumed).
+    (4, "answer events", [
+        """CREATE TABLE IF NOT EXISTS answer_events (
+            answered_at TIMESTAMP NOT NULL,
+            session_id UUID NOT NULL,
+            question_id BIGINT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            position SMALLINT NOT NULL,
+            chosen SMALLINT NOT NULL,
+            correct BOOLEAN NOT NULL,
+            timed_out BOOLEAN NOT NULL
+        ) PARTITION BY RANGE (answered_at)""",
+        # Catches rows outside the created months (clock skew, partitions not yet created)
+        "CREATE TABLE IF NOT EXISTS answer_events_default PARTITION OF answer_events DEFAULT",
+        "CREATE INDEX IF NOT EXISTS answer_events_question_idx "
+        "ON answer_events (question_id, answered_at) INCLUDE (chosen, correct, timed_out, latency_ms)",
+        # Identifies an answer, so a replayed spool cannot insert it twice (ON CONFLICT DO
+        # NOTHING); a unique index on a partitioned table must include the partition key
+        "CREATE UNIQUE INDEX IF NOT EXISTS answer_events_session_position_key "
+        "ON answer_events (session_id, position, answered_at)",
+    ], True),
+    # Written by utils/question_stats.py; option_rates[i] is the share of answers choosing option i
+    (5, "question statistics", [
+        """CREATE TABLE IF NOT EXISTS question_stats (
+            question_id BIGINT PRIMARY KEY,
+            attempts BIGINT NOT NULL,
+            p_value REAL NOT NULL,
+            point_biserial REAL,
+            timeout_rate REAL NOT NULL,
+            median_latency_ms INTEGER,
+            correct_option SMALLINT,
+            option_rates REAL[] NOT NULL,
+            computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ], True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+_LOCK_ID = 0x51_5A_4D_53  # "QZMS": advisory lock key for migrations
+
+
+def current_version():
+    try:
+        with db.cursor() as cur:
+            cur.execute("SELECT max(version) FROM schema_migrations")
+            return cur.fetchone()[0] or 0
+    except errors.UndefinedTable:
+        return 0
+
+
+def migrate():
+    # Returns the list of versions applied (empty when already up to date)
+    if current_version() >= LATEST_VERSION:
+        return []
+    pool = db.get_pool()
+    conn = pool.getconn()
+    applied = []
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+            cur.execute("SELECT pg_advisory_lock(%s)", (_LOCK_ID,))
+            try:
+                # Another process may have migrated while we waited for the lock
+                cur.execute("SELECT coalesce(max(version), 0) FROM schema_migrations")
+                version = cur.fetchone()[0]
+                for number, description, statements, transactional in MIGRATIONS:
+                    if number <= version:
+                        continue
+                    indexes = _concurrent_index_names(statements)
+                    for name in _invalid_indexes(cur, indexes):
+                        print(f"Dropping invalid index {name} left by an interrupted build")
+                        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                    if transactional:
+                        cur.execute("BEGIN")
+                    try:
+                        for statement in statements:
+                            cur.execute(statement)
+                        invalid = _invalid_indexes(cur, indexes)
+                        if invalid:
+                            raise RuntimeError(f"Migration {number} left invalid index(es) {', '.join(invalid)}; "
+                                               "fix the cause (e.g. duplicate rows) and restart")
+                        cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                                    (number, description))
+                        if transactional:
+                            cur.execute("COMMIT")
+                    except psycopg2.Error:
+                        if transactional:
+                            cur.execute("ROLLBACK")
+                        raise
+                    applied.append(number)
+                    print(f"Applied migration {number}: {description}")
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_ID,))
+    finally:
+        conn.autocommit = False
+        pool.putconn(conn)
+    return applied
+
+
+def _concurrent_index_names(statements):
+    names = []
+    for statement in statements:
+        names += re.findall(r"INDEX CONCURRENTLY IF NOT EXISTS (\w+)", statement)
+    return names
+
+
+def _invalid_indexes(cur, names):
+    if not names:
+        return []
+    cur.execute("SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid AND c.relname = ANY(%s) AND pg_table_is_visible(c.oid)", (names,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def repair_invalid_indexes():
+    # For schemas migrated before the validity check: rebuilds any migration index left INVALID
+    names = [name for _, _, statements, _ in MIGRATIONS for name in _concurrent_index_names(statements)]
+    pool = db.get_pool()
+    conn = pool.getconn()
+    repaired = []
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for name in _invalid_indexes(cur, names):
+                cur.execute(f"REINDEX INDEX CONCURRENTLY {name}")
+                repaired.append(name)
+    finally:
+        conn.autocommit = False
+        pool.putconn(conn)
+    return repaired
+
+
+# ================== RETENTION ==================
+def prune_password_resets(max_age_days=30, batch_size=5000):
+    # Deletes in batches so a large backlog never holds long locks
+    deleted = 0
+    while True:
+        with db.cursor() as cur:
+            cur.execute("""DELETE FROM password_resets WHERE id IN (
+                SELECT id FROM password_resets
+                WHERE requested_at < now() - make_interval(days => %s)
+                LIMIT %s)""", (max_age_days, batch_size))
+            count = cur.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+# ================== PARTITIONS ==================
+def _month(year, month):
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def ensure_answer_partitions(months_ahead=2):
+    # Creates the answer_events partitions for this month and the next
+    # `months_ahead`; one catalog lookup when they already exist. Run at
+    # startup, so the default partition only ever sees stray rows.
+    today = date.today()
+    months = [_month(today.year, today.month + i) for i in range(months_ahead + 1)]
+    names = [f"answer_events_{m:%Y_%m}" for m in months]
+    with db.cursor() as cur:
+        cur.execute("SELECT relname FROM pg_class WHERE relname = ANY(%s)", (names,))
+        existing = {row[0] for row in cur.fetchall()}
+    created = []
+    for name, start in zip(names, months):
+        if name in existing:
+            continue
+        end = _month(start.year, start.month + 1)
+        try:
+            with db.cursor() as cur:
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF answer_events "
+                            "FOR VALUES FROM (%s) TO (%s)", (start, end))
+            created.append(name)
+        except psycopg2.Error as e:
+            # Rows for that month already sit in the default partition; move them out by hand
+            print(f"Could not create partition {name}:", e)
+    return created
+
+
+# ================== QUERY PLAN CHECKS ==================
+# The hot queries and the indexes each one may use. With sequential scans
+# disabled for the check, a query whose plan still touches none of them
+# means an index is missing or no longer matches the query shape. A query
+# without SQL is the prepared statement of that name registered by
+# utils/repository.py, explained exactly as the app runs it, so the check
+# cannot drift from the statement.
+HOT_QUERIES = [
+    # A user with few rows may be served from either index
+    ("fetch_user_results", None, ("probe",),
+     ("quiz_results_username_created_at_idx", "quiz_results_username_id_idx")),
+    ("fetch_user_results_after", None, ("probe", 0), ("quiz_results_username_id_idx",)),
+    ("password_hash", None, ("probe",), ("users_username_key",)),
+    ("user_exists", None, ("probe",), ("users_username_key",)),
+    ("has_given_feedback", None, ("probe",), ("feedback_pkey",)),
+    ("find_username_by_email", "SELECT username FROM users WHERE email=%s", ("probe",), ("users_email_idx",)),
+    ("prune_password_resets", "SELECT id FROM password_resets WHERE requested_at < now() - interval '30 days'",
+     (), ("password_resets_requested_at_idx",)),
+]
+
+
+def _plan_indexes(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _plan_indexes(child)
+    return names
+
+
+def check_query_plans(queries=None):
+    # Returns [(name, ok, indexes_used)]
+    from utils import repository  # noqa: F401  (registers the prepared statements)
+
+    results = []
+    with db.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, sql, params, expected in queries or HOT_QUERIES:
+            if sql is None:
+                plan = db.explain_prepared(cur, name, params)
+            else:
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = _plan_indexes(plan[0]["Plan"])
+            results.append((name, bool(used & set(expected)), sorted(used)))
+    return results
+
+
+# ================== CLI ==================
+# python -m utils.migrations [--check-plans] [--repair-indexes] [--prune-days N]
+# Connects with the DB_HOST / DB_NAME / DB_USER / DB_PASS / DB_PORT environment variables.
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    parser = argparse.ArgumentParser(description="Apply QuizMaster schema migrations")
+    parser.add_argument("--check-plans", action="store_true", help="EXPLAIN the hot queries and verify index use")
+    parser.add_argument("--repair-indexes", action="store_true",
+                        help="rebuild migration indexes left INVALID by an interrupted concurrent build")
+    parser.add_argument("--prune-days", type=int, help="delete password_resets older than this many days")
+    args = parser.parse_args()
+
+    db.init_pool(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                 password=os.getenv("DB_PASS"), port=os.getenv("DB_PORT", 5432))
+    applied = migrate()
+    print(f"Schema at version {current_version()} ({len(applied)} migration(s) applied)")
+    for name in ensure_answer_partitions():
+        print(f"Created partition {name}")
+    if args.repair_indexes:
+        for name in repair_invalid_indexes():
+            print(f"Rebuilt invalid index {name}")
+    if args.prune_days is not None:
+        print(f"Pruned {prune_password_resets(args.prune_days)} password reset(s)")
+    if args.check_plans:
+        failed = False
+        for name, ok, used in check_query_plans():
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: {', '.join(used) or 'no index'}")
+            failed |= not ok
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,188 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ================== PASSWORD HASHING ==================
+# Passwords are stored as self-describing strings:
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# Hashing costs tens of milliseconds by design, so it runs on a small
+# worker pool (hashlib releases the GIL while it works): the Tk thread and
+# the DBExecutor workers never spin on it, and concurrent logins use all
+# cores. A stored value made with other parameters (or a legacy plaintext
+# password) still verifies, and needs_rehash tells the caller to store a
+# fresh hash so accounts move to the current cost on their next login.
+#
+# Configured from the environment on first use:
+#   PASSWORD_HASH_SCHEME       scrypt (default) or pbkdf2_sha256
+#   PASSWORD_SCRYPT_N          CPU/memory cost, power of two (default 16384)
+#   PASSWORD_PBKDF2_ITERATIONS (default 600000)
+#   PASSWORD_HASH_WORKERS      pool size (default: CPU count)
+SCHEMES = ("scrypt", "pbkdf2_sha256")
+SALT_BYTES = 16
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PasswordHasher:
+    def __init__(self, scheme="scrypt", scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 pbkdf2_iterations=600_000, workers=None):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password hash scheme {scheme!r}")
+        self.scheme = scheme
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        # Verified against for unknown users, so they take as long as real ones
+        self._dummy = self._hash(os.urandom(12).hex())
+
+    # ---------- Key derivation (worker threads) ----------
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p + (1 << 20), dklen=32)
+
+    @staticmethod
+    def _pbkdf2(password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+    def _hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        if self.scheme == "scrypt":
+            n, r, p = self.scrypt_n, self.scrypt_r, self.scrypt_p
+            return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(self._scrypt(password, salt, n, r, p))}"
+        iterations = self.pbkdf2_iterations
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(self._pbkdf2(password, salt, iterations))}"
+
+    def _verify(self, password, stored):
+        if stored is None:
+            self._verify(password, self._dummy)
+            return False, False
+        parts = stored.split("$")
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            derived = self._scrypt(password, _unb64(parts[4]), n, r, p)
+            expected = _unb64(parts[5])
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            derived = self._pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            expected = _unb64(parts[3])
+        else:
+            # Legacy plaintext password from before hashing was introduced
+            ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+            return ok, ok
+        ok = hmac.compare_digest(derived, expected)
+        return ok, ok and self.needs_rehash(stored)
+
+    # ---------- Public API ----------
+    def needs_rehash(self, stored):
+        if self.scheme == "scrypt":
+            return not stored.startswith(f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}$")
+        return not stored.startswith(f"pbkdf2_sha256${self.pbkdf2_iterations}$")
+
+    def hash_async(self, password):
+        return self._pool.submit(self._hash, password)
+
+    def verify_async(self, password, stored):
+        # Future of (matches, needs_rehash); stored=None (unknown user) costs the same as a real check
+        return self._pool.submit(self._verify, password, stored)
+
+    def hash(self, password):
+        return self.hash_async(password).result()
+
+    def verify(self, password, stored):
+        return self.verify_async(password, stored).result()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+# ================== SHARED HASHER ==================
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    # Created on first use, after the remote configuration has set the environment
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            workers = os.getenv("PASSWORD_HASH_WORKERS")
+            _hasher = PasswordHasher(
+                scheme=os.getenv("PASSWORD_HASH_SCHEME", "scrypt"),
+                scrypt_n=int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14)),
+                pbkdf2_iterations=int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", 600_000)),
+                workers=int(workers) if workers else None,
+            )
+        return _hasher
+
+
+# ================== BENCHMARK ==================
+# python -m utils.passwords [logins] [concurrency ...]
+# Login latency (verify only) when that many users log in at once, for the
+# configured scheme and cost, next to the single-login cost.
+if __name__ == "__main__":
+    import sys
+    import time
+
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    levels = [int(a) for a in sys.argv[2:]] or [1, 4, 16]
+    hasher = get_hasher()
+    stored = hasher.hash("correct horse battery staple")
+    cost = f"n={hasher.scrypt_n}" if hasher.scheme == "scrypt" else f"iterations={hasher.pbkdf2_iterations}"
+    print(f"{hasher.scheme} ({cost}), {hasher.workers} worker(s), {os.cpu_count()} CPU(s)")
+    print(f"{'concurrent':>10}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for level in levels:
+        latencies = []
+        lock = threading.Lock()
+        todo = iter(range(logins))
+
+        def user():
+            for _ in todo:
+                start = time.perf_counter()
+                assert hasher.verify("correct horse battery staple", stored)[0]
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=user) for _ in range(level)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(f"{level:>10}{logins / elapsed:>10.1f}{pct(0.5):>10.1f}{pct(0.95):>10.1f}{pct(0.99):>10.1f}")
+
+    # Meanwhile another thread (standing in for Tk) keeps its 10 ms ticks
+    gaps = []
+    done = threading.Event()
+
+    def ui_loop():
+        last = time.perf_counter()
+        while not done.is_set():
+            time.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ui = threading.Thread(target=ui_loop)
+    ui.start()
+    for f in [hasher.verify_async("correct horse battery staple", stored) for _ in range(logins)]:
+        f.result()
+    done.set()
+    ui.join()
+    print(f"UI thread during {logins} logins: worst tick {max(gaps) * 1000:.1f} ms (target 10 ms)")
+    hasher.close()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import random
+import threading
+from array import array
+
+from utils.file_handler import DATA_FILE
+
+
+def question_key(item):
+    # Stable id recorded with every answer (see answer_events): the item's own
+    # "id" when questions.json gives one, else a 63-bit BLAKE2b hash of the
+    # question text and its options in order. Reordering the file keeps the
+    # id; editing the text or options gives a new one, since the stored
+    # option indexes would no longer mean the same thing. "id" on a decoded
+    # question is only its position in the current bank.
+    if item.get("id") is not None:
+        return int(item["id"])
+    payload = json.dumps([item["question"], list(item["options"])], ensure_ascii=False).encode("utf-8")
+    digest = hashlib.blake2b(payload, digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def check_unique_keys(keys):
+    # Two questions sharing a key would merge their answers and statistics
+    seen = {}
+    for position, key in enumerate(keys):
+        if key in seen:
+            raise ValueError(f"Questions {seen[key]} and {position} have the same question id {key}; "
+                             "give one of them an explicit \"id\" or remove the duplicate")
+        seen[key] = position
+
+
+# ================== QUESTION BANK ==================
+# Parses questions.json once and keeps it in memory in a compact, indexed
+# form: parallel lists of question text and option tuples, a byte array
+# holding the index of the correct option and an array of stable question
+# ids. The file is only re-parsed when its mtime/size changes *and* its
+# content hash differs, so starting a quiz costs one os.stat() instead of
+# a full JSON parse.
+class QuestionBank:
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._digest = None
+        # (texts, options, answer indexes, question ids), swapped as one unit on reload
+        self._data = ([], [], array("b"), array("q"))
+
+    def __len__(self):
+        self.refresh()
+        return len(self._data[0])
+
+    def refresh(self):
+        st = os.stat(self.path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if stat_key == self._stat_key:
+            return False
+        with self._lock:
+            if stat_key == self._stat_key:
+                return False
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.blake2b(raw, digest_size=16).digest()
+            if digest == self._digest:
+                # Touched but not changed (e.g. copied over with the same content)
+                self._stat_key = stat_key
+                return False
+            self._data = self._index(json.loads(raw))
+            self._digest = digest
+            self._stat_key = stat_key
+            return True
+
+    def _index(self, items):
+        texts, options, answers, keys = [], [], array("b"), array("q")
+        for item in items:
+            opts = tuple(item["options"])
+            texts.append(item["question"])
+            options.append(opts)
+            answers.append(opts.index(item["answer"]) if item["answer"] in opts else -1)
+            keys.append(question_key(item))
+        check_unique_keys(keys)
+        return texts, options, answers, keys
+
+    @staticmethod
+    def _decode(data, qid):
+        texts, options, answers, keys = data
+        opts = options[qid]
+        answer_idx = answers[qid]
+        return {
+            "id": qid,
+            "question_id": keys[qid],
+            "question": texts[qid],
+            "options": list(opts),
+            "answer": opts[answer_idx] if answer_idx >= 0 else None,
+        }
+
+    def sample_ids(self, k, rng=random):
+        # random.sample over a range picks k ids without copying the bank
+        self.refresh()
+        n = len(self._data[0])
+        return rng.sample(range(n), min(k, n))
+
+    def get(self, qid):
+        self.refresh()
+        return self._decode(self._data, qid)
+
+    def sample(self, k, rng=random):
+        self.refresh()
+        data = self._data
+        n = len(data[0])
+        return [self._decode(data, qid) for qid in rng.sample(range(n), min(k, n))]
+
+    def all(self):
+        self.refresh()
+        data = self._data
+        return [self._decode(data, qid) for qid in range(len(data[0]))]
+
+
+# ================== SHARED INSTANCE ==================
+_default_bank = None
+_default_source = None  # stats of the .qmb and questions.json the choice was made for
+_default_lock = threading.Lock()
+
+
+def _binary_bank_is_current():
+    from utils.question_store import BIN_FILE, is_current_format
+    try:
+        bin_mtime = os.stat(BIN_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    if not is_current_format(BIN_FILE):
+        print(f"{os.path.normpath(BIN_FILE)} is from an older version; "
+              "recompile it with python -m utils.question_store")
+        return False
+    try:
+        return bin_mtime >= os.stat(DATA_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def _source_key():
+    from utils.question_store import BIN_FILE
+    key = []
+    for path in (BIN_FILE, DATA_FILE):
+        try:
+            st = os.stat(path)
+            key.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            key.append(None)
+    return tuple(key)
+
+
+def get_question_bank():
+    # Prefer the compiled, memory-mapped bank (python -m utils.question_store)
+    # when it is at least as new as questions.json. The choice is made again
+    # whenever either file changes, so editing questions.json after compiling
+    # falls back to the JSON bank instead of serving the stale .qmb
+    global _default_bank, _default_source
+    source = _source_key()
+    if source != _default_source:
+        with _default_lock:
+            if source != _default_source:
+                from utils.question_store import MappedQuestionBank
+                wanted = MappedQuestionBank if _binary_bank_is_current() else QuestionBank
+                if not isinstance(_default_bank, wanted):
+                    _default_bank = wanted()
+                _default_source = source
+    return _default_bank
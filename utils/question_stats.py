@@ -0,0 +1,309 @@
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from utils import db
+
+LATENCY_BIN_MS = 100   # median latency resolution
+LATENCY_BINS = 600     # 0-60 s; slower answers land in the last bin
+
+# Per answer, as read from the server: question_id, chosen, correct, timed_out,
+# latency_ms, and the session's total_questions / correct_answers from quiz_results
+COLUMNS = 7
+ANSWERS_SQL = ("SELECT a.question_id, a.chosen, a.correct::int, a.timed_out::int, a.latency_ms, "
+               "r.total_questions, r.correct_answers "
+               "FROM answer_events a JOIN quiz_results r ON r.event_id = a.session_id")
+
+
+# ================== VECTORISED ACCUMULATOR ==================
+# Folds chunks of answers (NumPy arrays, any size) into per-question running
+# sums with np.bincount, so no Python code runs per answer and memory depends
+# on the number of questions, not answers. results() turns the sums into:
+#
+#   p_value          share of attempts answered correctly (timeouts count as wrong)
+#   point_biserial   correlation between getting this question right and the
+#                    share of the session's *other* questions answered right
+#                    (corrected item-rest correlation; None when undefined)
+#   option_rates     share of non-timed-out answers choosing each option, one
+#                    entry per option of that question (0.0 for options nobody
+#                    chose); the rates of options other than correct_option are
+#                    the distractor selection rates
+#   median_latency   of non-timed-out answers, from a LATENCY_BIN_MS histogram
+#
+# Question ids are sparse (63-bit hashes), so they are mapped to dense rows through a
+# sorted key array that grows when a chunk brings unseen ids. `n_options` maps
+# question ids to their number of options (from the question bank); questions
+# not in it (since removed from the bank) get as many rates as their highest
+# chosen option needs.
+class QuestionStats:
+    _SUMS = ("attempts", "correct", "timeouts", "rest_n", "rest_x", "rest_y", "rest_yy", "rest_xy")
+
+    def __init__(self, n_options=None):
+        self.n_options = dict(n_options or {})
+        self.keys = np.empty(0, dtype=np.int64)
+        self.sums = {name: np.zeros(0) for name in self._SUMS}
+        self.option_counts = np.zeros((0, max(self.n_options.values(), default=0)), dtype=np.int64)
+        self.latency_hist = np.zeros((0, LATENCY_BINS), dtype=np.int64)
+        self.correct_option = np.zeros(0, dtype=np.int64)
+        self.answers = 0
+
+    # ---------- Dense question rows ----------
+    def _rows(self, question_ids):
+        pos = np.searchsorted(self.keys, question_ids)
+        if len(self.keys):
+            known = self.keys[np.minimum(pos, len(self.keys) - 1)] == question_ids
+            if known.all():
+                return pos
+        self._grow(np.union1d(self.keys, question_ids))
+        return np.searchsorted(self.keys, question_ids)
+
+    def _grow(self, keys):
+        old = np.searchsorted(keys, self.keys)
+
+        def moved(array, fill=0):
+            grown = np.full((len(keys),) + array.shape[1:], fill, dtype=array.dtype)
+            grown[old] = array
+            return grown
+        self.sums = {name: moved(a) for name, a in self.sums.items()}
+        self.option_counts = moved(self.option_counts)
+        self.latency_hist = moved(self.latency_hist)
+        self.correct_option = moved(self.correct_option, -1)
+        self.keys = keys
+
+    # ---------- Accumulation ----------
+    def add(self, question_id, chosen, correct, timed_out, latency_ms, session_total, session_correct):
+        # One chunk of answers as equal-length integer arrays
+        rows = self._rows(question_id)
+        n = len(self.keys)
+        x = correct.astype(np.float64)
+        sums = self.sums
+        sums["attempts"] += np.bincount(rows, minlength=n)
+        sums["correct"] += np.bincount(rows, x, minlength=n)
+        sums["timeouts"] += np.bincount(rows, timed_out, minlength=n)
+
+        # Rest score: the session's share correct without this answer (needs 2+ questions)
+        multi = session_total > 1
+        r, xr = rows[multi], x[multi]
+        y = (session_correct[multi] - xr) / (session_total[multi] - 1)
+        sums["rest_n"] += np.bincount(r, minlength=n)
+        sums["rest_x"] += np.bincount(r, xr, minlength=n)
+        sums["rest_y"] += np.bincount(r, y, minlength=n)
+        sums["rest_yy"] += np.bincount(r, y * y, minlength=n)
+        sums["rest_xy"] += np.bincount(r, xr * y, minlength=n)
+
+        answered = ~timed_out.astype(bool) & (chosen >= 0)
+        r, choice = rows[answered], chosen[answered]
+        width = max(self.option_counts.shape[1], int(choice.max()) + 1 if len(choice) else 0)
+        if width > self.option_counts.shape[1]:
+            self.option_counts = np.pad(self.option_counts, ((0, 0), (0, width - self.option_counts.shape[1])))
+        self.option_counts += np.bincount(r * width + choice, minlength=n * width).reshape(n, width)
+        bins = np.minimum(latency_ms[answered] // LATENCY_BIN_MS, LATENCY_BINS - 1)
+        self.latency_hist += np.bincount(r * LATENCY_BINS + bins, minlength=n * LATENCY_BINS).reshape(n, LATENCY_BINS)
+        hit = correct.astype(bool) & answered
+        self.correct_option[rows[hit]] = chosen[hit]
+        self.answers += len(rows)
+
+    def add_block(self, block):
+        # block: (rows, COLUMNS) integer array in ANSWERS_SQL column order
+        self.add(*(block[:, i] for i in range(COLUMNS)))
+
+    # ---------- Results ----------
+    def _median_latency(self):
+        hist = self.latency_hist
+        total = hist.sum(axis=1)
+        cum = hist.cumsum(axis=1)
+        half = total / 2
+        idx = np.minimum((cum < half[:, None]).sum(axis=1), LATENCY_BINS - 1)
+        rows = np.arange(len(hist))
+        before = np.where(idx > 0, cum[rows, idx - 1], 0)
+        inside = hist[rows, idx]
+        frac = np.divide(half - before, inside, out=np.zeros_like(half), where=inside > 0)
+        median = (idx + frac) * LATENCY_BIN_MS
+        return np.where(total > 0, median, np.nan)
+
+    def results(self):
+        # [(question_id, attempts, p_value, point_biserial, timeout_rate, median_latency_ms,
+        #   correct_option, option_rates)] ordered by question_id
+        s = self.sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_value = s["correct"] / s["attempts"]
+            timeout_rate = s["timeouts"] / s["attempts"]
+            n, sx, sy = s["rest_n"], s["rest_x"], s["rest_y"]
+            cov = n * s["rest_xy"] - sx * sy
+            var_x = n * sx - sx * sx
+            var_y = n * s["rest_yy"] - sy * sy
+            r_pb = cov / np.sqrt(var_x * var_y)
+            answered = self.option_counts.sum(axis=1)
+            option_rates = self.option_counts / answered[:, None]
+        columns = np.arange(1, self.option_counts.shape[1] + 1)
+        chosen_width = np.where(self.option_counts > 0, columns, 0).max(axis=1, initial=0)
+        width = [max(self.n_options.get(int(key), 0), int(chosen_width[i])) for i, key in enumerate(self.keys)]
+        r_pb = np.where((var_x > 0) & (var_y > 1e-12), np.clip(r_pb, -1, 1), np.nan)
+        median = self._median_latency()
+        return [
+            (int(self.keys[i]), int(s["attempts"][i]), float(p_value[i]),
+             None if np.isnan(r_pb[i]) else float(r_pb[i]),
+             float(timeout_rate[i]),
+             None if np.isnan(median[i]) else int(round(median[i])),
+             int(self.correct_option[i]) if self.correct_option[i] >= 0 else None,
+             [0.0 if np.isnan(v) else round(float(v), 6) for v in option_rates[i, :width[i]]])
+            for i in range(len(self.keys))
+        ]
+
+
+# ================== POSTGRESQL SOURCE AND SINK ==================
+class _ChunkSink:
+    # File-like target for copy_expert: buffers COPY text and hands every
+    # ~block_bytes of complete lines to NumPy's C parser as one int64 array
+    def __init__(self, on_block, block_bytes=32 << 20):
+        self.on_block = on_block
+        self.block_bytes = block_bytes
+        self._parts = []
+        self._size = 0
+
+    def write(self, data):
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= self.block_bytes:
+            self._emit()
+
+    def _emit(self, final=False):
+        data = b"".join(self._parts)
+        cut = len(data) if final else data.rfind(b"\n") + 1
+        self._parts = [data[cut:]] if cut < len(data) else []
+        self._size = len(data) - cut
+        if cut:
+            values = np.fromstring(data[:cut], dtype=np.int64, sep=" ")  # any whitespace separates
+            self.on_block(values.reshape(-1, COLUMNS))
+
+    def close(self):
+        self._emit(final=True)
+
+
+def bank_option_counts():
+    # {question_id: number of options} for the current question bank
+    from utils.question_bank import get_question_bank
+    return {q["question_id"]: len(q["options"]) for q in get_question_bank().all()}
+
+
+def compute_question_stats_pg(since=None, block_bytes=32 << 20, n_options=None):
+    # Streams every answer (answered_at >= since) with COPY; answers whose
+    # quiz_results row has not been written yet are left out until the next run.
+    # n_options defaults to the current question bank's option counts
+    stats = QuestionStats(bank_option_counts() if n_options is None else n_options)
+    sink = _ChunkSink(stats.add_block, block_bytes)
+    with db.cursor() as cur:
+        sql = ANSWERS_SQL
+        if since is not None:
+            sql += cur.mogrify(" WHERE a.answered_at >= %s", (since,)).decode()
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT", sink, size=1 << 20)
+    sink.close()
+    return stats
+
+
+def save_question_stats_pg(results):
+    # Replaces the whole table in one transaction; readers see the old rows until it commits
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM question_stats")
+        execute_values(cur, "INSERT INTO question_stats (question_id, attempts, p_value, point_biserial, "
+                            "timeout_rate, median_latency_ms, correct_option, option_rates) VALUES %s",
+                       results, page_size=1000)
+    return len(results)
+
+
+# ================== SYNTHETIC BENCHMARK ==================
+def synthetic_chunks(answers, questions=2000, per_session=20, options=4, chunk=1_000_000, seed=7):
+    # Rasch-style data: each session has an ability, each question a difficulty,
+    # so p-values and discrimination come out realistic. Yields ANSWERS_SQL-shaped blocks.
+    rng = np.random.default_rng(seed)
+    question_ids = np.unique(rng.integers(0, 2**63 - 1, questions, dtype=np.int64))
+    difficulty = rng.normal(0, 1, questions)
+    key = rng.integers(0, options, questions)
+    done = 0
+    while done < answers:
+        sessions = -(-min(chunk, answers - done) // per_session)
+        ability = np.repeat(rng.normal(0, 1, sessions), per_session)
+        q = rng.integers(0, questions, sessions * per_session)
+        correct = rng.random(len(q)) < 1 / (1 + np.exp(difficulty[q] - ability))
+        timed_out = ~correct & (rng.random(len(q)) < 0.05)
+        correct &= ~timed_out
+        wrong = (key[q] + rng.integers(1, options, len(q))) % options
+        chosen = np.where(timed_out, -1, np.where(correct, key[q], wrong))
+        latency = np.where(timed_out, 20_000, rng.gamma(3, 1500, len(q)).astype(np.int64))
+        session_correct = np.repeat(correct.reshape(sessions, per_session).sum(axis=1), per_session)
+        yield np.column_stack([question_ids[q], chosen, correct, timed_out, latency,
+                               np.full(len(q), per_session), session_correct]).astype(np.int64)
+        done += len(q)
+
+
+def _python_loop(block):
+    # The row-by-row equivalent, for comparison
+    acc = {}
+    for qid, chosen, correct, timed_out, latency, total, score in block.tolist():
+        a = acc.setdefault(qid, [0, 0, 0, 0.0, 0.0, 0.0, 0.0, {}, []])
+        a[0] += 1
+        a[1] += correct
+        a[2] += timed_out
+        y = (score - correct) / (total - 1)
+        a[3] += 1
+        a[4] += y
+        a[5] += y * y
+        a[6] += correct * y
+        if not timed_out:
+            a[7][chosen] = a[7].get(chosen, 0) + 1
+            a[8].append(latency)
+    for a in acc.values():
+        a[8].sort()
+    return acc
+
+
+# ================== CLI ==================
+# python -m utils.question_stats [--since 2024-01-01]        recompute question_stats
+# python -m utils.question_stats --benchmark [ANSWERS]       synthetic run, no database
+# Connects with the DB_HOST / DB_NAME / DB_USER / DB_PASS / DB_PORT environment variables.
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Compute per-question statistics from answer_events")
+    parser.add_argument("--since", help="only answers from this time on")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=10_000_000, metavar="ANSWERS",
+                        help="time the engine on synthetic answers instead (default 10M)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        stats = QuestionStats()
+        elapsed = 0.0
+        sample = None
+        for block in synthetic_chunks(args.benchmark):  # generation is not timed
+            start = time.perf_counter()
+            stats.add_block(block)
+            elapsed += time.perf_counter() - start
+            if sample is None:
+                sample = block[:500_000]
+        start = time.perf_counter()
+        results = stats.results()
+        elapsed += time.perf_counter() - start
+        print(f"NumPy: {stats.answers:,} answers, {len(results)} questions in {elapsed:.2f}s "
+              f"({stats.answers / elapsed:,.0f} answers/s)")
+        start = time.perf_counter()
+        _python_loop(sample)
+        loop = time.perf_counter() - start
+        print(f"Python loop: {len(sample):,} answers in {loop:.2f}s ({len(sample) / loop:,.0f} answers/s)")
+        r_pb = [r[3] for r in results if r[3] is not None]
+        print(f"p-value range {min(r[2] for r in results):.2f}-{max(r[2] for r in results):.2f}, "
+              f"mean point-biserial {sum(r_pb) / len(r_pb):.3f}")
+    else:
+        db.init_pool(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                     password=os.getenv("DB_PASS"), port=os.getenv("DB_PORT", 5432))
+        try:
+            start = time.perf_counter()
+            stats = compute_question_stats_pg(args.since)
+            read = time.perf_counter() - start
+            # An empty window keeps the previous stats rather than wiping them
+            saved = save_question_stats_pg(stats.results()) if stats.answers else 0
+        finally:
+            db.close_pool()
+        print(f"{stats.answers:,} answers read in {read:.1f}s; stats saved for {saved} question(s) "
+              f"in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,165 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import threading
+
+from utils.question_bank import check_unique_keys, question_key
+
+# ================== BINARY QUESTION BANK FORMAT ==================
+# Layout (all integers little-endian):
+#   header   : magic b"QMQB", version u16, reserved u16, count u32
+#   offsets  : (count + 1) x u64, absolute byte offset of each record; the
+#              last entry marks the end of the final record
+#   records  : question id i64 (see question_bank.question_key), answer
+#              index i8, option count u8, question (u32 length + UTF-8
+#              bytes), then each option the same way
+# The reader mmaps the file and decodes only the records it is asked for,
+# so opening a bank and sampling a quiz cost the same for 50 or 5 million
+# questions.
+MAGIC = b"QMQB"
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+OFFSET = struct.Struct("<Q")
+RECORD_HEAD = struct.Struct("<qbB")
+STR_LEN = struct.Struct("<I")
+
+BIN_FILE = os.path.join(os.path.dirname(__file__), "../data/questions.qmb")
+
+
+def is_current_format(path):
+    with open(path, "rb") as f:
+        head = f.read(HEADER.size)
+    return len(head) == HEADER.size and HEADER.unpack(head)[:2] == (MAGIC, VERSION)
+
+
+def _encode_record(item):
+    options = item["options"]
+    if len(options) > 255:
+        raise ValueError(f"Too many options in question: {item['question']!r}")
+    answer = options.index(item["answer"]) if item["answer"] in options else -1
+    parts = [RECORD_HEAD.pack(question_key(item), answer, len(options))]
+    for text in [item["question"], *options]:
+        data = text.encode("utf-8")
+        parts.append(STR_LEN.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def compile_question_bank(json_path, out_path=BIN_FILE):
+    with open(json_path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    check_unique_keys([question_key(item) for item in items])
+    count = len(items)
+    data_start = HEADER.size + OFFSET.size * (count + 1)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        # Reserve header + offset table, stream the records, then back-fill the offsets
+        f.write(b"\0" * data_start)
+        offsets = [data_start]
+        for item in items:
+            f.write(_encode_record(item))
+            offsets.append(f.tell())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count))
+        f.write(struct.pack(f"<{count + 1}Q", *offsets))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, out_path)
+    return count
+
+
+# ================== MEMORY-MAPPED READER ==================
+# Same interface as utils.question_bank.QuestionBank (sample/get/all/len).
+class MappedQuestionBank:
+    def __init__(self, path=BIN_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat_key = None
+        # (mmap, offsets view, count), swapped as one unit when the file is replaced;
+        # an old mapping stays valid until the last reader using it drops it
+        self._state = (None, None, 0)
+
+    def __len__(self):
+        self.refresh()
+        return self._state[2]
+
+    def refresh(self):
+        st = os.stat(self.path)
+        stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stat_key == self._stat_key:
+            return False
+        with self._lock:
+            if stat_key == self._stat_key:
+                return False
+            self._state = self._open()
+            self._stat_key = stat_key
+            return True
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} question bank")
+        offsets = memoryview(mm)[HEADER.size:HEADER.size + OFFSET.size * (count + 1)].cast("Q")
+        return mm, offsets, count
+
+    @staticmethod
+    def _decode(state, qid):
+        mm, offsets, _ = state
+        pos = offsets[qid]
+        question_id, answer_idx, n_options = RECORD_HEAD.unpack_from(mm, pos)
+        pos += RECORD_HEAD.size
+        texts = []
+        for _ in range(n_options + 1):
+            (length,) = STR_LEN.unpack_from(mm, pos)
+            pos += STR_LEN.size
+            texts.append(mm[pos:pos + length].decode("utf-8"))
+            pos += length
+        options = texts[1:]
+        return {
+            "id": qid,
+            "question_id": question_id,
+            "question": texts[0],
+            "options": options,
+            "answer": options[answer_idx] if answer_idx >= 0 else None,
+        }
+
+    def sample_ids(self, k, rng=random):
+        self.refresh()
+        count = self._state[2]
+        return rng.sample(range(count), min(k, count))
+
+    def get(self, qid):
+        self.refresh()
+        state = self._state
+        if not 0 <= qid < state[2]:
+            raise IndexError(qid)
+        return self._decode(state, qid)
+
+    def sample(self, k, rng=random):
+        self.refresh()
+        state = self._state
+        count = state[2]
+        return [self._decode(state, qid) for qid in rng.sample(range(count), min(k, count))]
+
+    def all(self):
+        self.refresh()
+        state = self._state
+        return [self._decode(state, qid) for qid in range(state[2])]
+
+
+# ================== CLI ==================
+if __name__ == "__main__":
+    from utils.file_handler import DATA_FILE
+
+    parser = argparse.ArgumentParser(description="Compile questions.json into a memory-mapped question bank")
+    parser.add_argument("source", nargs="?", default=DATA_FILE, help="questions JSON file")
+    parser.add_argument("output", nargs="?", default=BIN_FILE, help="binary bank to write")
+    args = parser.parse_args()
+    n = compile_question_bank(args.source, args.output)
+    print(f"Compiled {n} questions into {os.path.normpath(args.output)}")
@@ -0,0 +1,224 @@
+import io
+
+import psycopg2
+
+from utils import db
+
+# ================== DATA ACCESS HELPERS ==================
+# Every helper borrows its own pooled connection, so they are safe to call
+# from any thread and one failing statement never poisons the others.
+# The hot paths (login, register, history, feedback check) run as prepared
+# statements: one round trip each, selecting only the columns they use.
+db.register_statement("register_user",
+                      "INSERT INTO users (username, password, email) VALUES ($1, $2, $3) "
+                      "ON CONFLICT (username) DO NOTHING RETURNING 1")
+db.register_statement("password_hash", "SELECT password FROM users WHERE username=$1")
+db.register_statement("user_exists", "SELECT 1 FROM users WHERE username=$1")
+db.register_statement("fetch_user_results",
+                      "SELECT total_questions, correct_answers, created_at, id FROM quiz_results "
+                      "WHERE username=$1 ORDER BY created_at DESC")
+db.register_statement("fetch_user_results_after",
+                      "SELECT total_questions, correct_answers, created_at, id FROM quiz_results "
+                      "WHERE username=$1 AND id > $2 ORDER BY id DESC")
+db.register_statement("has_given_feedback", "SELECT 1 FROM feedback WHERE username=$1")
+
+
+# ---------- Users ----------
+# Passwords arrive here already hashed (see utils/passwords.py)
+def save_user_pg(username, password_hash, email):
+    # Returns False when the username is taken; the existence check and the insert are one statement
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "register_user", (username, password_hash, email))
+        return cur.fetchone() is not None
+
+
+def fetch_password_hash_pg(username):
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "password_hash", (username,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def user_exists_pg(username):
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "user_exists", (username,))
+        return cur.fetchone() is not None
+
+
+# ---------- Password resets ----------
+def find_username_by_email(email):
+    with db.cursor() as cur:
+        cur.execute("SELECT username FROM users WHERE email=%s", (email,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def record_password_reset(username, email):
+    with db.cursor() as cur:
+        cur.execute("INSERT INTO password_resets (username, email) VALUES (%s, %s)", (username, email))
+
+
+def update_password(username, password_hash, expected=None):
+    # With `expected`, only replaces that exact stored value (used by rehash-on-login)
+    with db.cursor() as cur:
+        if expected is None:
+            cur.execute("UPDATE users SET password=%s WHERE username=%s", (password_hash, username))
+        else:
+            cur.execute("UPDATE users SET password=%s WHERE username=%s AND password=%s",
+                        (password_hash, username, expected))
+
+
+# ---------- Quiz results ----------
+def save_quiz_result_pg(username, total_questions, correct_answers, event_id=None):
+    # Returns the server-assigned created_at so callers can update their caches
+    with db.cursor() as cur:
+        cur.execute("INSERT INTO quiz_results (username, total_questions, correct_answers, event_id) "
+                    "VALUES (%s, %s, %s, %s) RETURNING created_at",
+                    (username, total_questions, correct_answers, str(event_id) if event_id else None))
+        return cur.fetchone()[0]
+
+
+def save_answer_events_pg(session_id, rows):
+    # A session's answers in one COPY (text format) instead of one INSERT per answer;
+    # rows as produced by QuizSession.answer_events()
+    if not rows:
+        return 0
+    buf = io.StringIO()
+    for position, question_id, chosen, correct, timed_out, latency_ms, answered_at in rows:
+        buf.write(f"{answered_at.isoformat(sep=' ')}\t{session_id}\t{question_id}\t{latency_ms}\t"
+                  f"{position}\t{chosen}\t{'t' if correct else 'f'}\t{'t' if timed_out else 'f'}\n")
+    buf.seek(0)
+    with db.cursor() as cur:
+        cur.copy_expert("COPY answer_events (answered_at, session_id, question_id, latency_ms, "
+                        "position, chosen, correct, timed_out) FROM STDIN", buf)
+    return len(rows)
+
+
+def fetch_user_results_pg(username):
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "fetch_user_results", (username,))
+        return cur.fetchall()
+
+
+def fetch_user_results_after_pg(username, after_id):
+    # Rows the server inserted after after_id, whatever their (client-clock) created_at
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "fetch_user_results_after", (username, after_id))
+        return cur.fetchall()
+
+
+def stream_user_results_pg(username, after_id=None, chunk_size=5000, since=None):
+    # A named (server-side) cursor: rows come over chunk_size at a time instead of all at once
+    sql = "SELECT total_questions, correct_answers, created_at, id FROM quiz_results WHERE username=%s"
+    params = [username]
+    if after_id is not None:
+        sql += " AND id > %s"
+        params.append(after_id)
+    if since is not None:
+        sql += " AND created_at > %s"
+        params.append(since)
+    with db.get_pool().connection() as conn:
+        with conn.cursor(name="stream_user_results") as cur:
+            cur.itersize = chunk_size
+            cur.execute(sql + " ORDER BY id", params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+
+# ---------- Feedback, comments and reports ----------
+def has_given_feedback(username):
+    with db.cursor() as cur:
+        db.execute_prepared(cur, "has_given_feedback", (username,))
+        return cur.fetchone() is not None
+
+
+def save_feedback(username, rating, liked, note):
+    try:
+        with db.cursor() as cur:
+            cur.execute("INSERT INTO feedback (username, rating, liked, feedback_note) VALUES (%s, %s, %s, %s)",
+                        (username, rating, liked, note))
+    except Exception as e:
+        print("Feedback save error:", e)
+
+
+def save_comment(username, comment_text):
+    try:
+        with db.cursor() as cur:
+            cur.execute("INSERT INTO comments (username, comment) VALUES (%s, %s)", (username, comment_text))
+    except psycopg2.Error as e:
+        print("Comment save error:", e)
+
+
+def save_report(username, report_text):
+    try:
+        with db.cursor() as cur:
+            cur.execute("INSERT INTO reports (username, report) VALUES (%s, %s)", (username, report_text))
+    except psycopg2.Error as e:
+        print("Report save error:", e)
+
+
+# ================== MICRO-BENCHMARK ==================
+# python -m utils.repository [calls]
+# Per-call latency of the hot queries as ad-hoc SQL (the old SELECT * form
+# and the exists-then-insert register) versus the prepared statements above.
+# Connects with the DB_HOST / DB_NAME / DB_USER / DB_PASS / DB_PORT environment variables.
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    import uuid
+
+    from utils.migrations import migrate
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    db.init_pool(host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+                 password=os.getenv("DB_PASS"), port=os.getenv("DB_PORT", 5432), maxconn=1)
+    migrate()
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    user = prefix + "_user"
+    save_user_pg(user, "secret", user + "@example.com")
+    for _ in range(20):
+        save_quiz_result_pg(user, 10, 7)
+
+    def adhoc_register(i):
+        name = f"{prefix}_a{i}"
+        with db.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE username=%s", (name,))
+            if cur.fetchone() is None:
+                cur.execute("INSERT INTO users (username, password, email) VALUES (%s, %s, %s)", (name, "pw", "a@b"))
+
+    def adhoc(sql, params):
+        def run(i):
+            with db.cursor() as cur:
+                cur.execute(sql, params)
+                cur.fetchall()
+        return run
+
+    cases = [
+        ("login lookup", adhoc("SELECT * FROM users WHERE username=%s", (user,)),
+         lambda i: fetch_password_hash_pg(user)),
+        ("exists", adhoc("SELECT * FROM users WHERE username=%s", (user,)), lambda i: user_exists_pg(user)),
+        ("history", adhoc("SELECT * FROM quiz_results WHERE username=%s ORDER BY created_at DESC", (user,)),
+         lambda i: fetch_user_results_pg(user)),
+        ("feedback check", adhoc("SELECT * FROM feedback WHERE username=%s", (user,)),
+         lambda i: has_given_feedback(user)),
+        ("register", adhoc_register, lambda i: save_user_pg(f"{prefix}_p{i}", "pw", "a@b")),
+    ]
+    print(f"{'query':<16}{'ad-hoc us':>12}{'prepared us':>14}{'speed-up':>10}")
+    for name, old, new in cases:
+        timings = []
+        for fn in (old, new):
+            fn(-1)  # warm up (and PREPARE on this connection)
+            start = time.perf_counter()
+            for i in range(calls):
+                fn(i)
+            timings.append((time.perf_counter() - start) / calls * 1e6)
+        print(f"{name:<16}{timings[0]:>12.1f}{timings[1]:>14.1f}{timings[0] / timings[1]:>9.2f}x")
+
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM quiz_results WHERE username LIKE %s", (prefix + "%",))
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (prefix + "%",))
+    db.close_pool()
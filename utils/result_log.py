@@ -0,0 +1,196 @@
+import atexit
+import csv
+import glob
+import gzip
+import io
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime
+
+HEADER = ["Username", "Total Questions", "Correct Answers"]
+
+
+# ================== BUFFERED RESULT LOG ==================
+# log() only appends the row to an in-memory buffer; a background thread
+# writes buffered rows as one CSV append once `batch_size` rows are
+# waiting, every `flush_interval` seconds, and at interpreter exit. The
+# live file is rotated when it passes `max_bytes` or (with daily=True) when
+# the date changes: it is renamed to <name>.<timestamp>.csv, gzipped by
+# the flushing thread when compress=True, and only the newest `keep`
+# rotated segments are kept, so disk use stays bounded. iter_results()
+# streams rows from all segments, oldest first.
+#
+# Rows still in the buffer when the process dies are lost; call flush() when
+# a row must be on disk before continuing.
+class ResultLogger:
+    def __init__(self, path, batch_size=256, flush_interval=1.0, max_bytes=10 * 1024 * 1024,
+                 daily=False, compress=True, keep=30):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.compress = compress
+        self.keep = keep
+        self.stats = {"logged": 0, "flushes": 0, "rotations": 0}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._buffer = []
+        self._closed = False
+        self._opened_on = self._file_date()
+        self._thread = threading.Thread(target=self._run, name="result-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _file_date(self):
+        if os.path.exists(self.path):
+            return date.fromtimestamp(os.path.getmtime(self.path))
+        return date.today()
+
+    # ---------- Producer side ----------
+    def log(self, username, total, score):
+        with self._lock:
+            self._buffer.append((username, total, score))
+            self.stats["logged"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+
+    # ---------- Writing ----------
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            if self._should_rotate():
+                self._rotate()
+            out = io.StringIO()
+            writer = csv.writer(out)
+            if not os.path.exists(self.path) or not os.path.getsize(self.path):
+                writer.writerow(HEADER)
+            writer.writerows(rows)
+            with open(self.path, "a", newline="") as f:
+                f.write(out.getvalue())
+            self.stats["flushes"] += 1
+            return len(rows)
+
+    def _should_rotate(self):
+        if not os.path.exists(self.path):
+            self._opened_on = date.today()
+            return False
+        if self.daily and date.today() != self._opened_on:
+            return True
+        return os.path.getsize(self.path) >= self.max_bytes
+
+    def _rotate(self):
+        stem, ext = os.path.splitext(self.path)
+        target = f"{stem}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{ext}"
+        os.replace(self.path, target)
+        self._opened_on = date.today()
+        self.stats["rotations"] += 1
+        if self.compress:
+            self._compress(target)
+        self._prune()
+
+    @staticmethod
+    def _compress(segment):
+        try:
+            with open(segment, "rb") as src, gzip.open(segment + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(segment + ".gz.tmp", segment + ".gz")
+            os.remove(segment)
+        except OSError as e:
+            print("Result log compression error:", e)
+
+    def _prune(self):
+        for old in rotated_segments(self.path)[:-self.keep or None]:
+            try:
+                os.remove(old)
+            except OSError as e:
+                print("Result log cleanup error:", e)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                print("Result log write error:", e)
+                time.sleep(self.flush_interval)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        try:
+            self.flush()
+        except OSError as e:
+            print("Result log write error:", e)
+
+
+# ================== READER ==================
+def rotated_segments(path):
+    # Oldest first; the timestamp in the name sorts chronologically
+    stem, ext = os.path.splitext(path)
+    plain = glob.glob(f"{glob.escape(stem)}.*{ext}")
+    # While a segment is being compressed both forms exist briefly; the plain one wins
+    packed = [p for p in glob.glob(f"{glob.escape(stem)}.*{ext}.gz") if p[:-3] not in plain]
+    return sorted(plain + packed, key=lambda p: p[len(stem) + 1:])
+
+
+def iter_results(path):
+    # Streams (username, total, score) rows across rotated segments and the live file
+    for segment in rotated_segments(path) + [path]:
+        opener = gzip.open if segment.endswith(".gz") else open
+        try:
+            f = opener(segment, "rt", newline="")
+        except FileNotFoundError:
+            continue  # pruned or compressed while we were listing
+        with f:
+            for row in csv.reader(f):
+                if row and row != HEADER:
+                    yield row[0], int(row[1]), int(row[2])
+
+
+# ================== BENCHMARK ==================
+# python -m utils.result_log [rows]
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user_track.csv")
+        logger = ResultLogger(path, max_bytes=256 * 1024, keep=5)
+        start = time.perf_counter()
+        for i in range(count):
+            logger.log(f"user{i % 500}", 10, i % 11)
+        per_call = (time.perf_counter() - start) / count
+        logger.close()
+        files = rotated_segments(path) + [path]
+        size = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+        rows = sum(1 for _ in iter_results(path))
+        print(f"{count} rows: {per_call * 1e6:.2f} us per log() call, {logger.stats['rotations']} rotations, "
+              f"{len(files)} file(s) kept, {size / 1024:.0f} KiB on disk, {rows} rows readable")
+
+        # The old save_user_result: open, exists check, append one row, close
+        old_path = os.path.join(tmp, "old.csv")
+        start = time.perf_counter()
+        for i in range(min(count, 20_000)):
+            exists = os.path.exists(old_path)
+            with open(old_path, mode="a", newline="") as f:
+                writer = csv.writer(f)
+                if not exists:
+                    writer.writerow(HEADER)
+                writer.writerow([f"user{i % 500}", 10, i % 11])
+        print(f"open/append/close per row: {(time.perf_counter() - start) / min(count, 20_000) * 1e6:.2f} us")
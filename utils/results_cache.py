@@ -0,0 +1,72 @@
+import bisect
+import threading
+import time
+
+
+# ================== PER-USER RESULTS CACHE ==================
+# History, progress graph and CSV export all read the same quiz_results
+# rows. The cache keeps each user's rows in memory (ordered by created_at,
+# oldest first) together with the highest id seen: the first read fetches
+# the full history, later reads fetch only rows with a larger id, and reads
+# within `max_age` seconds of the last check skip the database entirely.
+# The watermark is the server-assigned id rather than created_at, because
+# created_at comes from the saving kiosk's clock and write-behind rows reach
+# the database late: either can put a new row below a created_at already
+# seen. Results saved by this process are added in place with id None and
+# swapped for the stored row once a fetch returns it.
+class ResultsCache:
+    def __init__(self, fetch_all, fetch_after, max_age=30.0):
+        # fetch_all(username) / fetch_after(username, after_id) return
+        # (total_questions, correct_answers, created_at, id) rows, in any order
+        self.fetch_all = fetch_all
+        self.fetch_after = fetch_after
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # username -> {"rows": [...oldest first], "max_id": int or None, "checked": monotonic time}
+        self._entries = {}
+
+    def get(self, username):
+        # Returns the user's rows newest first, like fetch_user_results_pg
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and time.monotonic() - entry["checked"] < self.max_age:
+                return entry["rows"][::-1]
+            after = entry["max_id"] if entry is not None else None
+
+        rows = self.fetch_all(username) if after is None else self.fetch_after(username, after)
+
+        with self._lock:
+            current = self._entries.get(username)
+            if current is None:
+                current = self._entries[username] = {"rows": [], "max_id": None, "checked": 0.0}
+            for row in reversed(rows):
+                self._insert(current["rows"], row)
+                if current["max_id"] is None or row[3] > current["max_id"]:
+                    current["max_id"] = row[3]
+            current["checked"] = time.monotonic()
+            return current["rows"][::-1]
+
+    @staticmethod
+    def _insert(rows, row):
+        # Keep rows ordered by created_at; a stored row replaces its unsaved copy and is never added twice
+        pos = bisect.bisect_left(rows, row[2], key=lambda r: r[2])
+        while pos < len(rows) and rows[pos][2] == row[2]:
+            same = rows[pos]
+            if row[3] is not None and same[3] == row[3]:
+                return
+            if row[3] is not None and same[3] is None and same[:3] == row[:3]:
+                rows[pos] = row
+                return
+            pos += 1
+        rows.insert(pos, row)
+
+    def record(self, username, total_questions, correct_answers, created_at):
+        # Called after this process saved a result; only updates users already cached
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                self._insert(entry["rows"], (total_questions, correct_answers, created_at, None))
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
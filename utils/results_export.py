@@ -0,0 +1,136 @@
+import csv
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from utils import storage
+
+WATERMARK_FILE = os.path.join(os.path.dirname(__file__), "../data/export_watermarks.json")
+HEADER = ["Total Questions", "Correct Answers", "Attempted At"]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_lock = threading.Lock()
+
+
+# ================== INCREMENTAL CSV EXPORT ==================
+# Appends a user's quiz results to a CSV file. Only results stored after the
+# high-water mark are read, and they are streamed from the storage backend
+# chunk by chunk (a server-side cursor on PostgreSQL) straight into the
+# file. Memory stays constant however long the history is, and a repeat
+# export only touches the new rows.
+#
+# The mark for each (file, user) pair is the id of the last exported row.
+# Ids are assigned by the database on insert, so rows saved late (a delayed
+# write-behind flush) or by a kiosk whose clock is behind still land above
+# it, which a created_at mark would skip for good. Marks are kept in
+# data/export_watermarks.json and used only while the file still exists.
+# Files from older versions have a created_at mark, or none at all, in
+# which case the last row's timestamp is read from the end of the file
+# (whole seconds, so export resumes at the next second); such files switch
+# to an id mark on their next export that writes rows.
+def _key(path, username):
+    return f"{os.path.abspath(path)}|{username}"
+
+
+def _load_marks():
+    try:
+        with open(WATERMARK_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_mark(path, username, last_id):
+    with _lock:
+        marks = _load_marks()
+        marks[_key(path, username)] = last_id
+        tmp = WATERMARK_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(marks, f)
+        os.replace(tmp, WATERMARK_FILE)
+
+
+def _tail_mark(path):
+    # Timestamp of the file's last data row, reading only its final block
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().decode("utf-8", errors="replace").splitlines()
+    for line in reversed(lines):
+        row = next(csv.reader([line]), [])
+        if len(row) == 3:
+            try:
+                return datetime.strptime(row[2], TIME_FORMAT) + timedelta(seconds=1) - timedelta(microseconds=1)
+            except ValueError:
+                return None  # header only
+    return None
+
+
+def watermark(path, username):
+    # (after_id, since): an id mark, or for older files a created_at to resume after
+    if not os.path.isfile(path) or not os.path.getsize(path):
+        return None, None
+    mark = _load_marks().get(_key(path, username))
+    if isinstance(mark, int):
+        return mark, None
+    if mark is not None:
+        return None, datetime.fromisoformat(mark)
+    return None, _tail_mark(path)
+
+
+def export_results_csv(username, path, chunk_size=5000):
+    # Returns the number of rows appended; when there is nothing to write, a new file is not created
+    storage.get_storage().flush()  # include results still in the write-behind spool
+    after_id, since = watermark(path, username)
+    write_header = not os.path.isfile(path) or not os.path.getsize(path)
+    written = 0
+    last = None
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(HEADER)
+        for rows in storage.stream_user_results(username, after_id, chunk_size, since):
+            writer.writerows((total, correct, created_at.strftime(TIME_FORMAT)) for total, correct, created_at, _ in rows)
+            written += len(rows)
+            last = rows[-1][3]
+    if last is not None:
+        _save_mark(path, username, last)
+    elif write_header:
+        os.remove(path)  # nothing to export: do not leave a header-only file behind
+    return written
+
+
+# ================== CLI ==================
+# python -m utils.results_export USERNAME PATH [--chunk-size N] [--trace-memory]
+# Connects with the DB_HOST / DB_NAME / DB_USER / DB_PASS / DB_PORT environment
+# variables (or STORAGE_BACKEND=sqlite). --trace-memory reports peak Python
+# memory, at the cost of a much slower run.
+if __name__ == "__main__":
+    import argparse
+    import time
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Append a user's new quiz results to a CSV file")
+    parser.add_argument("username")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--trace-memory", action="store_true")
+    args = parser.parse_args()
+
+    if (os.getenv("STORAGE_BACKEND") or "postgres").lower() == "sqlite":
+        from utils.sqlite_storage import SQLITE_FILE
+        storage.init_storage("sqlite", path=os.getenv("SQLITE_PATH", SQLITE_FILE))
+    else:
+        storage.init_storage("postgres", host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"),
+                             user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+                             port=os.getenv("DB_PORT", 5432), write_behind=False)
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    count = export_results_csv(args.username, args.path, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    storage.close_storage()
+    print(f"Appended {count} row(s) to {args.path} in {elapsed:.2f}s")
+    if args.trace_memory:
+        print(f"Peak Python memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB")
@@ -0,0 +1,110 @@
+import os
+import threading
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "../assets")
+SOUND_FILES = {
+    "click": "click.wav",
+    "correct": "correct.wav",
+    "wrong": "wrong.wav",
+    "timeout": "timeout.mp3",
+}
+
+
+# ================== SOUND REGISTRY ==================
+# Initialises the mixer once per process and decodes every asset once
+# (in the background via preload(), or lazily on first play). Sounds are
+# played through a fixed pool of mixer channels: a free channel is used if
+# there is one, otherwise the oldest one is taken over. When pygame or an
+# audio device is missing, or QUIZ_AUDIO=off, the registry falls back to a
+# silent backend and play() is a no-op.
+class SoundRegistry:
+    def __init__(self, files=SOUND_FILES, channels=8):
+        self.files = files
+        self.num_channels = channels
+        self._lock = threading.RLock()
+        self._sounds = {}
+        self._channels = []
+        self._next_channel = 0
+        self._mixer = None
+        self._headless = os.getenv("QUIZ_AUDIO", "on").lower() in ("off", "0", "false")
+
+    @property
+    def headless(self):
+        self._init_mixer()
+        return self._headless
+
+    def _init_mixer(self):
+        if self._mixer is not None or self._headless:
+            return
+        with self._lock:
+            if self._mixer is not None or self._headless:
+                return
+            try:
+                import pygame
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                pygame.mixer.set_num_channels(self.num_channels)
+                self._channels = [pygame.mixer.Channel(i) for i in range(self.num_channels)]
+                self._mixer = pygame.mixer
+            except Exception as e:
+                print("Audio unavailable, continuing without sound:", e)
+                self._headless = True
+
+    def _load(self, name):
+        sound = self._sounds.get(name)
+        if sound is not None:
+            return sound
+        with self._lock:
+            sound = self._sounds.get(name)
+            if sound is None:
+                sound = self._mixer.Sound(os.path.join(ASSETS_DIR, self.files[name]))
+                self._sounds[name] = sound
+        return sound
+
+    def preload(self, background=True):
+        def run():
+            self._init_mixer()
+            if self._headless:
+                return
+            for name in self.files:
+                try:
+                    self._load(name)
+                except Exception as e:
+                    print(f"Could not load sound '{name}':", e)
+        if background:
+            thread = threading.Thread(target=run, name="sound-preload", daemon=True)
+            thread.start()
+            return thread
+        run()
+        return None
+
+    def _channel(self):
+        for channel in self._channels:
+            if not channel.get_busy():
+                return channel
+        channel = self._channels[self._next_channel]
+        self._next_channel = (self._next_channel + 1) % len(self._channels)
+        return channel
+
+    def play(self, name):
+        self._init_mixer()
+        if self._headless:
+            return
+        try:
+            self._channel().play(self._load(name))
+        except Exception as e:
+            print(f"Sound error: {e}")
+
+
+# ================== SHARED INSTANCE ==================
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_sound_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SoundRegistry()
+    return _registry
@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import datetime, timedelta
+
+from utils.storage import Storage
+
+SQLITE_FILE = os.path.join(os.path.dirname(__file__), "../data/quizmaster.db")
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # fixed width, so text order is time order
+
+# Schema versions, tracked with PRAGMA user_version (same shape as utils/migrations.py)
+SCHEMA = [
+    (1, [
+        """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            total_questions INTEGER NOT NULL,
+            correct_answers INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS feedback (
+            username TEXT PRIMARY KEY,
+            rating INTEGER,
+            liked INTEGER,
+            feedback_note TEXT
+        )""",
+        "CREATE TABLE IF NOT EXISTS comments (id INTEGER PRIMARY KEY, username TEXT, comment TEXT)",
+        "CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, username TEXT, report TEXT, created_at TEXT)",
+        "CREATE TABLE IF NOT EXISTS password_resets (id INTEGER PRIMARY KEY, username TEXT, email TEXT, requested_at TEXT)",
+        "CREATE INDEX IF NOT EXISTS quiz_results_username_created_at_idx ON quiz_results (username, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS quiz_results_username_id_idx ON quiz_results (username, id)",
+        "CREATE INDEX IF NOT EXISTS users_email_idx ON users (email)",
+        "CREATE INDEX IF NOT EXISTS password_resets_requested_at_idx ON password_resets (requested_at)",
+    ]),
+    (2, [
+        "ALTER TABLE quiz_results ADD COLUMN event_id TEXT",
+        """CREATE TABLE IF NOT EXISTS answer_events (
+            answered_at TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            chosen INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            timed_out INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS answer_events_question_idx ON answer_events (question_id, answered_at)",
+    ]),
+]
+
+
+def _ts(value):
+    return value.strftime(_TS_FORMAT)
+
+
+def _results(rows):
+    return [(total, correct, datetime.strptime(created_at, _TS_FORMAT), row_id)
+            for total, correct, created_at, row_id in rows]
+
+
+class _ThreadConnection:
+    # One thread's connection. Only that thread's threading.local data holds it
+    # strongly, so it is closed as soon as the thread exits (short-lived
+    # executor workers included) instead of lingering until close()
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self, optimize=False):
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        try:
+            if optimize:
+                conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def __del__(self):
+        self.close()
+
+
+# ================== SQLITE BACKEND ==================
+# One local database file in WAL mode: readers never block the writer and
+# each write is a single appended WAL frame, so calls take microseconds
+# instead of a network round trip. sqlite3 connections are not shared
+# between threads, so every thread (Tk, DBExecutor workers, ...) lazily
+# opens its own; all statements are single-statement autocommit writes or
+# plain reads, and busy_timeout covers the rare writer overlap.
+class SQLiteStorage(Storage):
+    def __init__(self, path=SQLITE_FILE, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()  # _ThreadConnection of every live thread
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._migrate()
+
+    # ---------- Connections ----------
+    def _conn(self):
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.conn is None:
+            if self._closed:
+                raise RuntimeError("SQLite storage is closed")
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            # With WAL, NORMAL only syncs at checkpoints: a power cut may lose the
+            # last commits but never corrupts the database
+            conn.execute("PRAGMA synchronous = NORMAL")
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    def _migrate(self):
+        conn = self._conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in SCHEMA:
+            if number <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _one(self, sql, params):
+        return self._conn().execute(sql, params).fetchone()
+
+    # ---------- Users ----------
+    def save_user(self, username, password_hash, email):
+        cur = self._conn().execute("INSERT INTO users (username, password, email) VALUES (?, ?, ?) "
+                                   "ON CONFLICT (username) DO NOTHING", (username, password_hash, email))
+        return cur.rowcount == 1
+
+    def get_password_hash(self, username):
+        row = self._one("SELECT password FROM users WHERE username=?", (username,))
+        return row[0] if row else None
+
+    def user_exists(self, username):
+        return self._one("SELECT 1 FROM users WHERE username=?", (username,)) is not None
+
+    def find_username_by_email(self, email):
+        row = self._one("SELECT username FROM users WHERE email=?", (email,))
+        return row[0] if row else None
+
+    def update_password(self, username, password_hash, expected=None):
+        if expected is None:
+            self._conn().execute("UPDATE users SET password=? WHERE username=?", (password_hash, username))
+        else:
+            self._conn().execute("UPDATE users SET password=? WHERE username=? AND password=?",
+                                 (password_hash, username, expected))
+
+    # ---------- Password resets ----------
+    def record_password_reset(self, username, email):
+        self._conn().execute("INSERT INTO password_resets (username, email, requested_at) VALUES (?, ?, ?)",
+                             (username, email, _ts(datetime.now())))
+
+    def prune_password_resets(self, max_age_days=30):
+        cutoff = _ts(datetime.now() - timedelta(days=max_age_days))
+        return self._conn().execute("DELETE FROM password_resets WHERE requested_at < ?", (cutoff,)).rowcount
+
+    # ---------- Quiz results ----------
+    def save_quiz_result(self, username, total_questions, correct_answers, session_id=None):
+        created_at = datetime.now()
+        self._conn().execute(
+            "INSERT INTO quiz_results (username, total_questions, correct_answers, created_at, event_id) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (username, total_questions, correct_answers, _ts(created_at), str(session_id) if session_id else None))
+        return created_at
+
+    def save_answers(self, session_id, rows):
+        # SQLite has no COPY; one transaction around executemany is its batched equivalent
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO answer_events (answered_at, session_id, question_id, latency_ms, position, chosen, "
+                "correct, timed_out) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(_ts(answered_at), str(session_id), question_id, latency_ms, position, chosen, correct, timed_out)
+                 for position, question_id, chosen, correct, timed_out, latency_ms, answered_at in rows])
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def fetch_user_results(self, username):
+        return _results(self._conn().execute(
+            "SELECT total_questions, correct_answers, created_at, id FROM quiz_results "
+            "WHERE username=? ORDER BY created_at DESC", (username,)))
+
+    def fetch_user_results_after(self, username, after_id):
+        return _results(self._conn().execute(
+            "SELECT total_questions, correct_answers, created_at, id FROM quiz_results "
+            "WHERE username=? AND id > ? ORDER BY id DESC", (username, after_id)))
+
+    def stream_user_results(self, username, after_id=None, chunk_size=5000, since=None):
+        cur = self._conn().execute(
+            "SELECT total_questions, correct_answers, created_at, id FROM quiz_results "
+            "WHERE username=? AND id > ? AND created_at > ? ORDER BY id",
+            (username, after_id if after_id is not None else -1, _ts(since) if since is not None else ""))
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield _results(rows)
+
+    # ---------- Feedback, comments and reports ----------
+    def has_given_feedback(self, username):
+        return self._one("SELECT 1 FROM feedback WHERE username=?", (username,)) is not None
+
+    def save_feedback(self, username, rating, liked, note):
+        try:
+            self._conn().execute("INSERT INTO feedback (username, rating, liked, feedback_note) VALUES (?, ?, ?, ?)",
+                                 (username, rating, liked, note))
+        except sqlite3.Error as e:
+            print("Feedback save error:", e)
+
+    def save_comment(self, username, comment_text):
+        try:
+            self._conn().execute("INSERT INTO comments (username, comment) VALUES (?, ?)", (username, comment_text))
+        except sqlite3.Error as e:
+            print("Comment save error:", e)
+
+    def save_report(self, username, report_text):
+        try:
+            self._conn().execute("INSERT INTO reports (username, report, created_at) VALUES (?, ?, ?)",
+                                 (username, report_text, _ts(datetime.now())))
+        except sqlite3.Error as e:
+            print("Report save error:", e)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            holders = list(self._connections)
+            self._connections.clear()
+        for holder in holders:
+            holder.close(optimize=True)
@@ -0,0 +1,317 @@
+import os
+from abc import ABC, abstractmethod
+
+from utils.passwords import get_hasher
+
+# ================== STORAGE INTERFACE ==================
+# Everything the app persists: users, password resets, quiz results and
+# their per-answer events, feedback, comments and reports. main.py only
+# talks to the module-level functions at the bottom of this file, so the
+# backend is chosen once at startup (STORAGE_BACKEND=postgres|sqlite) and
+# nothing else needs to know which one is running.
+#
+#   postgres  the shared server; writes of results, answers, comments and
+#             reports go through the write-behind spool (utils/write_behind.py)
+#   sqlite    a single local file in WAL mode (utils/sqlite_storage.py) for
+#             single-machine deployments and tests; no server needed
+#
+# Timestamps are naive datetimes in both backends. Backends only ever see
+# password hashes; hashing and verification happen in the module-level
+# helpers below, on the utils/passwords.py worker pool. Backends must
+# implement every abstract method; a missing one fails at construction.
+class Storage(ABC):
+    # ---------- Users ----------
+    @abstractmethod
+    def save_user(self, username, password_hash, email):
+        # Returns False when the username is taken
+        ...
+
+    @abstractmethod
+    def get_password_hash(self, username):
+        # None when there is no such user
+        ...
+
+    @abstractmethod
+    def user_exists(self, username):
+        ...
+
+    @abstractmethod
+    def find_username_by_email(self, email):
+        ...
+
+    @abstractmethod
+    def update_password(self, username, password_hash, expected=None):
+        # With `expected`, only replaces that exact stored hash
+        ...
+
+    # ---------- Password resets ----------
+    @abstractmethod
+    def record_password_reset(self, username, email):
+        ...
+
+    @abstractmethod
+    def prune_password_resets(self, max_age_days=30):
+        # Returns the number of rows deleted
+        ...
+
+    # ---------- Quiz results ----------
+    @abstractmethod
+    def save_quiz_result(self, username, total_questions, correct_answers, session_id=None):
+        # Returns the result's created_at so callers can update their caches;
+        # session_id (stored as event_id) links the result to its answer events
+        ...
+
+    @abstractmethod
+    def save_answers(self, session_id, rows):
+        # One session's QuizSession.answer_events() rows, written as one batch
+        ...
+
+    @abstractmethod
+    def fetch_user_results(self, username):
+        # (total_questions, correct_answers, created_at, id) rows, newest first. created_at
+        # comes from the saving kiosk's clock; id is assigned by the database on insert,
+        # so incremental readers use it as their watermark
+        ...
+
+    @abstractmethod
+    def fetch_user_results_after(self, username, after_id):
+        # Rows with id > after_id, last inserted first
+        ...
+
+    @abstractmethod
+    def stream_user_results(self, username, after_id=None, chunk_size=5000, since=None):
+        # Yields lists of at most chunk_size rows with id > after_id, in id (insertion) order;
+        # memory use does not grow with the size of the history. `since` additionally
+        # requires created_at > since (only for watermarks written before ids were used)
+        ...
+
+    # ---------- Feedback, comments and reports ----------
+    @abstractmethod
+    def has_given_feedback(self, username):
+        ...
+
+    @abstractmethod
+    def save_feedback(self, username, rating, liked, note):
+        ...
+
+    @abstractmethod
+    def save_comment(self, username, comment_text):
+        ...
+
+    @abstractmethod
+    def save_report(self, username, report_text):
+        ...
+
+    def flush(self):
+        # Makes writes accepted so far visible to reads (the write-behind spool)
+        pass
+
+    def close(self):
+        pass
+
+
+# ================== POSTGRESQL BACKEND ==================
+class PostgresStorage(Storage):
+    def __init__(self, host, database, user, password, port=5432, minconn=1, maxconn=8, write_behind=True):
+        from utils import db, repository
+        from utils.migrations import ensure_answer_partitions, migrate
+
+        self._db = db
+        self._repo = repository
+        db.init_pool(host=host, database=database, user=user, password=password, port=port,
+                     minconn=minconn, maxconn=maxconn)
+        # One version check per launch; DDL only runs when the schema is behind
+        migrate()
+        ensure_answer_partitions()
+        self.write_buffer = None
+        if write_behind:
+            from utils.write_behind import WriteBehindBuffer
+            # Replays anything a previous run spooled but could not write
+            self.write_buffer = WriteBehindBuffer()
+
+    def save_user(self, username, password_hash, email):
+        return self._repo.save_user_pg(username, password_hash, email)
+
+    def get_password_hash(self, username):
+        return self._repo.fetch_password_hash_pg(username)
+
+    def user_exists(self, username):
+        return self._repo.user_exists_pg(username)
+
+    def find_username_by_email(self, email):
+        return self._repo.find_username_by_email(email)
+
+    def update_password(self, username, password_hash, expected=None):
+        self._repo.update_password(username, password_hash, expected)
+
+    def record_password_reset(self, username, email):
+        self._repo.record_password_reset(username, email)
+
+    def prune_password_resets(self, max_age_days=30):
+        from utils.migrations import prune_password_resets
+        return prune_password_resets(max_age_days)
+
+    def save_quiz_result(self, username, total_questions, correct_answers, session_id=None):
+        if self.write_buffer is not None:
+            return self.write_buffer.add("quiz_results", username=username, total_questions=total_questions,
+                                         correct_answers=correct_answers, event_id=session_id)
+        return self._repo.save_quiz_result_pg(username, total_questions, correct_answers, session_id)
+
+    def save_answers(self, session_id, rows):
+        # Spooled like the result they belong to, so a crash loses neither; without
+        # the buffer, straight to the server as one COPY
+        if self.write_buffer is not None:
+            return self.write_buffer.add_many("answer_events", [
+                {"answered_at": answered_at, "session_id": session_id, "question_id": question_id,
+                 "latency_ms": latency_ms, "position": position, "chosen": chosen, "correct": correct,
+                 "timed_out": timed_out}
+                for position, question_id, chosen, correct, timed_out, latency_ms, answered_at in rows])
+        return self._repo.save_answer_events_pg(session_id, rows)
+
+    def fetch_user_results(self, username):
+        return self._repo.fetch_user_results_pg(username)
+
+    def fetch_user_results_after(self, username, after_id):
+        return self._repo.fetch_user_results_after_pg(username, after_id)
+
+    def stream_user_results(self, username, after_id=None, chunk_size=5000, since=None):
+        return self._repo.stream_user_results_pg(username, after_id, chunk_size, since)
+
+    def has_given_feedback(self, username):
+        return self._repo.has_given_feedback(username)
+
+    def save_feedback(self, username, rating, liked, note):
+        self._repo.save_feedback(username, rating, liked, note)
+
+    def save_comment(self, username, comment_text):
+        if self.write_buffer is not None:
+            self.write_buffer.add("comments", username=username, comment=comment_text)
+        else:
+            self._repo.save_comment(username, comment_text)
+
+    def save_report(self, username, report_text):
+        if self.write_buffer is not None:
+            self.write_buffer.add("reports", username=username, report=report_text)
+        else:
+            self._repo.save_report(username, report_text)
+
+    def flush(self):
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+
+    def close(self):
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+        self._db.close_pool()
+
+
+# ================== ACTIVE BACKEND ==================
+_storage = None
+
+
+def init_storage(backend=None, **kwargs):
+    # backend defaults to $STORAGE_BACKEND, then "postgres"; kwargs go to the backend's constructor
+    global _storage
+    backend = (backend or os.getenv("STORAGE_BACKEND") or "postgres").lower()
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+    if backend == "postgres":
+        _storage = PostgresStorage(**kwargs)
+    elif backend == "sqlite":
+        from utils.sqlite_storage import SQLiteStorage
+        _storage = SQLiteStorage(**kwargs)
+    else:
+        raise ValueError(f"Unknown storage backend {backend!r} (expected 'postgres' or 'sqlite')")
+    return _storage
+
+
+def get_storage():
+    if _storage is None:
+        raise RuntimeError("Storage has not been initialised; call init_storage() first")
+    return _storage
+
+
+def close_storage():
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+
+
+# ---------- Module-level helpers ----------
+# Resolve the backend at call time, so they can be handed to DBExecutor or
+# ResultsCache before init_storage() has run on the startup thread.
+def save_user(username, password, email):
+    return get_storage().save_user(username, get_hasher().hash(password), email)
+
+
+def validate_user(username, password):
+    storage = get_storage()
+    stored = storage.get_password_hash(username)
+    ok, rehash = get_hasher().verify(password, stored)
+    if rehash:
+        # Hash parameters changed (or a legacy plaintext password): upgrade in the background
+        def store(future):
+            try:
+                storage.update_password(username, future.result(), expected=stored)
+            except Exception as e:
+                print("Password rehash error:", e)
+        get_hasher().hash_async(password).add_done_callback(store)
+    return ok
+
+
+def user_exists(username):
+    return get_storage().user_exists(username)
+
+
+def find_username_by_email(email):
+    return get_storage().find_username_by_email(email)
+
+
+def update_password(username, new_password):
+    return get_storage().update_password(username, get_hasher().hash(new_password))
+
+
+def record_password_reset(username, email):
+    return get_storage().record_password_reset(username, email)
+
+
+def prune_password_resets(max_age_days=30):
+    return get_storage().prune_password_resets(max_age_days)
+
+
+def save_quiz_result(username, total_questions, correct_answers, session_id=None):
+    return get_storage().save_quiz_result(username, total_questions, correct_answers, session_id)
+
+
+def save_answers(session_id, rows):
+    return get_storage().save_answers(session_id, rows)
+
+
+def fetch_user_results(username):
+    return get_storage().fetch_user_results(username)
+
+
+def fetch_user_results_after(username, after_id):
+    return get_storage().fetch_user_results_after(username, after_id)
+
+
+def stream_user_results(username, after_id=None, chunk_size=5000, since=None):
+    return get_storage().stream_user_results(username, after_id, chunk_size, since)
+
+
+def has_given_feedback(username):
+    return get_storage().has_given_feedback(username)
+
+
+def save_feedback(username, rating, liked, note):
+    return get_storage().save_feedback(username, rating, liked, note)
+
+
+def save_comment(username, comment_text):
+    return get_storage().save_comment(username, comment_text)
+
+
+def save_report(username, report_text):
+    return get_storage().save_report(username, report_text)
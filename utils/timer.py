@@ -0,0 +1,136 @@
+import math
+import time
+
+
+# ================== COUNTDOWN ==================
+# A countdown is defined by a time.monotonic() deadline rather than by how
+# many ticks have fired, so late callbacks (a slow query, a GC pause, a
+# modal popup) can delay the display but never stretch the time limit.
+class Countdown:
+    __slots__ = ("service", "limit", "on_tick", "on_expire", "started_at", "deadline",
+                 "paused_remaining", "paused_total", "paused_at", "stopped_at", "last_shown", "active")
+
+    def __init__(self, service, limit, on_tick, on_expire):
+        now = time.monotonic()
+        self.service = service
+        self.limit = limit
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.started_at = now
+        self.deadline = now + limit
+        self.paused_remaining = None
+        self.paused_total = 0.0
+        self.paused_at = None
+        self.stopped_at = None
+        self.last_shown = None
+        self.active = True
+
+    @property
+    def paused(self):
+        return self.paused_remaining is not None
+
+    def remaining(self, now=None):
+        if self.paused:
+            return self.paused_remaining
+        end = self.stopped_at if self.stopped_at is not None else (now or time.monotonic())
+        return max(0.0, self.deadline - end)
+
+    def elapsed(self, now=None):
+        # Active time since start, excluding pauses; capped at the limit once expired
+        end = self.stopped_at or self.paused_at or now or time.monotonic()
+        return min(self.limit, end - self.started_at - self.paused_total)
+
+    def pause(self):
+        if self.active and not self.paused:
+            self.paused_at = time.monotonic()
+            self.paused_remaining = max(0.0, self.deadline - self.paused_at)
+
+    def resume(self):
+        if self.active and self.paused:
+            now = time.monotonic()
+            self.paused_total += now - self.paused_at
+            self.deadline = now + self.paused_remaining
+            self.paused_remaining = None
+            self.paused_at = None
+            self.service._wake()
+
+    def stop(self):
+        # Stop without firing on_expire; returns the answer latency in seconds
+        if self.active:
+            if self.paused:
+                self.resume()
+            self.stopped_at = time.monotonic()
+            self.active = False
+        return self.elapsed()
+
+    cancel = stop
+
+
+# ================== TIMER SERVICE ==================
+# One shared root.after tick drives every active countdown. The tick is
+# only scheduled while something is counting, fires a little after each
+# whole-second boundary so the display changes on time, and calls
+# on_tick(seconds_left) only when the shown number changes.
+class TimerService:
+    def __init__(self, root, max_tick_ms=250):
+        self.root = root
+        self.max_tick_ms = max_tick_ms
+        self._countdowns = []
+        self._after_id = None
+
+    def start(self, seconds, on_tick=None, on_expire=None):
+        # The first evaluation is deferred to the event loop, so even a limit of 0
+        # never fires on_expire before the caller has the countdown in hand
+        countdown = Countdown(self, seconds, on_tick, on_expire)
+        self._countdowns.append(countdown)
+        self._wake(defer=True)
+        return countdown
+
+    def cancel_all(self):
+        for countdown in self._countdowns:
+            countdown.stop()
+        self._countdowns = []
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _wake(self, defer=False):
+        # Re-evaluate now (new or resumed countdown) instead of waiting for the next tick
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if defer:
+            self._after_id = self.root.after_idle(self._tick)
+        else:
+            self._tick()
+
+    def _tick(self):
+        self._after_id = None
+        now = time.monotonic()
+        expired = []
+        next_wait = None
+        for countdown in self._countdowns:
+            if not countdown.active or countdown.paused:
+                continue
+            remaining = countdown.deadline - now
+            shown = max(0, math.ceil(remaining))
+            if shown != countdown.last_shown:
+                countdown.last_shown = shown
+                if countdown.on_tick:
+                    countdown.on_tick(shown)
+            if remaining <= 0:
+                countdown.stopped_at = countdown.deadline
+                countdown.active = False
+                expired.append(countdown)
+                continue
+            # Wake just after the displayed number should next change
+            until_change = remaining - math.floor(remaining) or 1.0
+            next_wait = until_change if next_wait is None else min(next_wait, until_change)
+        self._countdowns = [c for c in self._countdowns if c.active]
+        if next_wait is not None:
+            delay = min(self.max_tick_ms, int(next_wait * 1000) + 1)
+            self._after_id = self.root.after(delay, self._tick)
+        # Expiry handlers run last: they may open modal popups or start the next countdown
+        for countdown in expired:
+            if countdown.on_expire:
+                countdown.on_expire()
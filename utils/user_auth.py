@@ -1,20 +1,50 @@
 import json
 import os
+import threading
+
+from utils.log_store import LogStore
+from utils.passwords import get_hasher
 
 AUTH_FILE = os.path.join(os.path.dirname(__file__), "../data/users.json")
+AUTH_LOG = os.path.join(os.path.dirname(__file__), "../data/users.log")
+
+# Values are password hashes from utils/passwords.py; entries written before
+# hashing was introduced are plaintext and get upgraded on the next login.
+# Users live in an append-only log (utils/log_store.py): registering is one
+# appended record and a login is a dict lookup, not a parse of every user.
+
+_store = None
+_store_lock = threading.Lock()
+
+def _users():
+    global _store
+    with _store_lock:
+        if _store is None:
+            first_open = not os.path.exists(AUTH_LOG)
+            _store = LogStore(AUTH_LOG)
+            if first_open and os.path.exists(AUTH_FILE):
+                # One-time import of the old whole-file JSON store
+                with open(AUTH_FILE, "r") as f:
+                    for username, password in json.load(f).items():
+                        _store.put(username, password)
+        return _store
 
 def load_users():
-    if os.path.exists(AUTH_FILE):
-        with open(AUTH_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    return dict(_users().items())
 
 def save_user(username, password):
-    users = load_users()
-    users[username] = password
-    with open(AUTH_FILE, "w") as f:
-        json.dump(users, f)
+    _users().put(username, get_hasher().hash(password))
 
 def validate_user(username, password):
-    users = load_users()
-    return users.get(username) == password
\ No newline at end of file
+    users = _users()
+    stored = users.get(username)
+    ok, rehash = get_hasher().verify(password, stored)
+    if rehash:
+        # Upgrade in the background, unless the password changed in the meantime
+        def store(future):
+            try:
+                users.put_if_equal(username, future.result(), stored)
+            except Exception as e:
+                print("Password rehash error:", e)
+        get_hasher().hash_async(password).add_done_callback(store)
+    return ok
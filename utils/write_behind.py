@@ -0,0 +1,213 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from utils import db
+
+SPOOL_FILE = os.path.join(os.path.dirname(__file__), "../data/write_spool.jsonl")
+
+# Tables that accept buffered inserts and their columns. Every row also
+# carries an event_id (unique per table, see migration 3), so replaying a
+# spool after a crash can never insert the same event twice. Callers may
+# pass their own event_id (a quiz session id); otherwise one is generated.
+TABLES = {
+    "quiz_results": ("username", "total_questions", "correct_answers", "created_at"),
+    "comments": ("username", "comment"),
+    "reports": ("username", "report", "created_at"),
+    "answer_events": ("answered_at", "session_id", "question_id", "latency_ms", "position", "chosen",
+                      "correct", "timed_out"),
+}
+
+# Tables whose rows already carry their event id: an answer is identified by
+# its session id and position (plus answered_at, which a unique index on a
+# partitioned table must include; see migration 4), so no event_id is added
+NATURAL_KEYS = {
+    "answer_events": ("session_id", "position", "answered_at"),
+}
+
+
+# ================== WRITE-BEHIND BUFFER ==================
+# add() appends the row to a local spool file (fsynced, so it survives a
+# crash) and returns immediately. A flusher thread sends buffered rows to
+# PostgreSQL in one transaction per batch, using multi-row INSERTs, once
+# `max_batch` rows are waiting or `flush_interval` seconds have passed.
+#
+# Before each flush the live spool is renamed to an .inflight segment and a
+# new one is started. Segments are deleted only after their rows are
+# committed. If the database is down, rows stay queued (and on disk), and the
+# next attempt backs off. On startup, leftover spool segments are replayed.
+class WriteBehindBuffer:
+    def __init__(self, spool_path=SPOOL_FILE, max_batch=500, flush_interval=2.0, max_backoff=60.0, fsync=True):
+        self.spool_path = spool_path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.fsync = fsync
+        self.stats = {"queued": 0, "flushed": 0, "batches": 0, "failures": 0}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._segment_seq = 0
+        self._closed = False
+        self._next_attempt = None  # monotonic deadline while backing off
+        self._recover()
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    # ---------- Spool ----------
+    def _segments(self):
+        return sorted(glob.glob(self.spool_path + ".*.inflight"),
+                      key=lambda p: int(p.rsplit(".", 2)[1]))
+
+    def _recover(self):
+        # Turn a spool left by a previous run into an inflight segment and queue all its rows
+        if os.path.exists(self.spool_path) and os.path.getsize(self.spool_path):
+            self._segment_seq = self._next_seq()
+            os.replace(self.spool_path, f"{self.spool_path}.{self._segment_seq}.inflight")
+        for path in self._segments():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        table, row = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash mid-write
+                    self._pending.append((table, row))
+        self._segment_seq = self._next_seq()
+        if self._pending:
+            print(f"Replaying {len(self._pending)} buffered write(s) from the spool")
+
+    def _next_seq(self):
+        segments = self._segments()
+        return int(segments[-1].rsplit(".", 2)[1]) + 1 if segments else self._segment_seq + 1
+
+    def _rotate(self):
+        # Caller holds self._lock
+        self._spool.close()
+        if os.path.getsize(self.spool_path):
+            os.replace(self.spool_path, f"{self.spool_path}.{self._segment_seq}.inflight")
+            self._segment_seq += 1
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    # ---------- Producer side ----------
+    @staticmethod
+    def _row(table, values):
+        if table not in TABLES:
+            raise ValueError(f"Table {table!r} is not write-behind enabled")
+        if "created_at" in TABLES[table] and values.get("created_at") is None:
+            values["created_at"] = datetime.now()
+        row = [values.get(col) for col in TABLES[table]]
+        row = [v.isoformat(sep=" ") if isinstance(v, datetime) else str(v) if isinstance(v, uuid.UUID) else v
+               for v in row]
+        if table not in NATURAL_KEYS:
+            row.append(str(values.get("event_id") or uuid.uuid4()))
+        return row
+
+    def add(self, table, **values):
+        self._append(table, [self._row(table, values)])
+        return values.get("created_at")
+
+    def add_many(self, table, rows):
+        # Several rows (dicts of column values) with one spool write and one fsync
+        self._append(table, [self._row(table, dict(values)) for values in rows])
+        return len(rows)
+
+    def _append(self, table, rows):
+        if not rows:
+            return
+        lines = "".join(json.dumps([table, row]) + "\n" for row in rows)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is closed")
+            self._spool.write(lines)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending.extend((table, row) for row in rows)
+            self.stats["queued"] += len(rows)
+            # During a backoff a full batch must not trigger an early retry
+            if len(self._pending) >= self.max_batch and self._next_attempt is None:
+                self._wakeup.notify()
+
+    # ---------- Flushing ----------
+    def flush(self):
+        # Returns the number of rows written; raises if the database write failed
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+                self._rotate()
+                segments = self._segments()
+            try:
+                self._write(batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch  # keep order; the segments stay on disk
+                    self.stats["failures"] += 1
+                raise
+            for path in segments:
+                os.remove(path)
+            self.stats["flushed"] += len(batch)
+            self.stats["batches"] += 1
+            return len(batch)
+
+    @staticmethod
+    def _write(batch):
+        by_table = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        with db.cursor() as cur:
+            for table, rows in by_table.items():
+                key = NATURAL_KEYS.get(table)
+                columns = ", ".join(TABLES[table] + (() if key else ("event_id",)))
+                conflict = ", ".join(key or ("event_id",))
+                execute_values(cur, f"INSERT INTO {table} ({columns}) VALUES %s ON CONFLICT ({conflict}) DO NOTHING",
+                               rows, page_size=1000)
+
+    def _run(self):
+        backoff = None  # set while the database is failing
+        while True:
+            with self._lock:
+                if self._next_attempt is None:
+                    if not self._closed and len(self._pending) < self.max_batch:
+                        self._wakeup.wait(self.flush_interval)
+                else:
+                    # Hold the backoff until the deadline; only close() cuts it short
+                    while not self._closed:
+                        remaining = self._next_attempt - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._wakeup.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+                backoff = None
+                with self._lock:
+                    self._next_attempt = None
+            except Exception as e:
+                print("Write-behind flush failed, will retry:", e)
+                backoff = min(self.max_backoff, (backoff or self.flush_interval) * 2)
+                with self._lock:
+                    self._next_attempt = time.monotonic() + backoff
+
+    def close(self, timeout=10.0):
+        # Final flush on shutdown; anything that cannot be written stays in the spool for next start
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print("Could not flush buffered writes; they will be replayed on next start:", e)
+        with self._lock:
+            self._spool.close()